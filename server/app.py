@@ -3,19 +3,42 @@
 # Standard library imports
 
 # Remote library imports
-from flask import Flask, send_from_directory, request, jsonify, make_response
-from flask import send_from_directory
+from flask import Flask, request, jsonify, make_response
 from flask_restful import Resource
+import logging
 import os
-import uuid
 import re
 from datetime import datetime
 from models import Owner, Property, Booking, PropertyImage, User ,Favorite # Add User here
-from werkzeug.utils import secure_filename
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from flask_cors import CORS
 from config import app, db, api, allowed_file
+from db_pool import pool_metrics
+from metrics import request_metrics
+from sqlalchemy import text
 from models import Owner, Property, Booking,PropertyImage, User
+from availability import available_properties_query, AVAILABILITY_ORDER
+from pagination import InvalidPageRequest, paginate
+from stay_index import stay_index
+from reservations import lock_property, indexed_conflict, locked_conflict, release_confirmed
+from serializers import (InvalidFields, requested_fields, property_serializer,
+                         booking_serializer, image_serializer)
+from loading import load_profile
+from passwords import PasswordHasherBusy
+from identity import claims_required, current_identity, identities, profile_claims
+from response_cache import response_cache, tag_properties
+from uploads import streamed
+import derivatives
+from derivatives import derivative_queue
+from image_store import image_store
+from image_serving import send_image
+from search import InvalidSearch, search_page
+from nearby import nearby_page
+import occupancy
+from occupancy import InvalidRange
+
+log = logging.getLogger('jambostays.api')
+auth_log = logging.getLogger('jambostays.auth')
 
 # FIXED: Proper CORS Configuration
 CORS(app, 
@@ -45,11 +68,16 @@ def health_check():
 def api_health_check():
     try:
         # Test database connection
-        db.session.execute('SELECT 1')
-        return {'status': 'healthy', 'message': 'JamboStays API and database are running'}, 200
+        db.session.execute(text('SELECT 1'))
+        return {'status': 'healthy', 'message': 'JamboStays API and database are running',
+                'pool': pool_metrics.snapshot()}, 200
     except Exception as e:
         return {'status': 'unhealthy', 'message': f'Database connection failed: {str(e)}'}, 500
 
+@app.route('/metrics')
+def metrics():
+    return request_metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/api/test-jwt', methods=['GET'])
 @jwt_required()
 def test_jwt():
@@ -62,28 +90,64 @@ def test_jwt():
 # Add request logging middleware
 @app.before_request
 def log_request_info():
-    if request.endpoint == 'get_profile':
-        print(f"DEBUG: Profile request - Headers: {dict(request.headers)}")
-        print(f"DEBUG: Profile request - Authorization: {request.headers.get('Authorization', 'None')}")
+    if request.endpoint == 'get_profile' and auth_log.isEnabledFor(logging.DEBUG):
+        headers = {name: '<redacted>' if name in ('Authorization', 'Cookie') else value
+                   for name, value in request.headers.items()}
+        auth_log.debug('Profile request', extra={'headers': headers,
+                                                  'has_token': 'Authorization' in request.headers})
 
 from flask import request
 
+# Keyset order for paginated list endpoints
+LISTING_ORDER = (Property.created_at, Property.id)
+BOOKING_ORDER = (Booking.created_at, Booking.id)
+
 # Removed duplicate property creation route
 
 @app.route('/api/properties', methods=['GET'])
+@response_cache.cached('properties')
 def get_properties():
     try:
-        properties = Property.query.all()
-        return [property.to_dict() for property in properties]
+        fields = requested_fields(request.args)
+        cards = tag_properties(property_serializer.serializer('card', fields))
+        query = load_profile(Property.query, 'listing', fields)
+        return paginate(query, LISTING_ORDER, request.args, cards)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return {'error': str(e)}, 400
     except Exception as e:
         return {'error': f'Database error: {str(e)}'}, 500
 
+@app.route('/api/properties/search', methods=['GET'])
+def search_properties():
+    try:
+        fields = requested_fields(request.args)
+        cards = property_serializer.serializer('card', fields)
+        return search_page(request.args, cards, lambda query: load_profile(query, 'listing', fields))
+    except (InvalidSearch, InvalidPageRequest, InvalidFields) as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': f'Search failed: {str(e)}'}, 500
+
+@app.route('/api/properties/nearby', methods=['GET'])
+def nearby_properties():
+    try:
+        fields = requested_fields(request.args)
+        cards = property_serializer.serializer('card', fields)
+        return nearby_page(request.args, cards, lambda query: load_profile(query, 'listing', fields))
+    except (InvalidSearch, InvalidPageRequest, InvalidFields) as e:
+        return {'error': str(e)}, 400
+    except Exception as e:
+        return {'error': f'Nearby search failed: {str(e)}'}, 500
+
 @app.route('/api/properties/<int:id>', methods=['GET'])
+@response_cache.cached('property:{id}')
 def get_property(id):
-    property = Property.query.get(id)
+    fields = requested_fields(request.args)
+    detail = property_serializer.serializer('detail', fields)
+    property = load_profile(Property.query, 'detail', fields).filter_by(id=id).first()
     if not property:
         return {"error": "Property not found"}, 404
-    return property.to_dict()
+    return detail(property)
 
 @app.route('/api/bookings', methods=['POST'])
 @jwt_required() 
@@ -92,7 +156,7 @@ def create_booking():
     
     data = request.get_json()
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_identity()
     if not current_user:
         return {"error": "User not found"}, 401
     # Basic validation
@@ -101,19 +165,37 @@ def create_booking():
         return {"error": "Missing required fields"}, 400
     
     
-    # Calculate total price
-    property = Property.query.get(data['property_id'])
-    if not property:
-        return {"error": "Property not found"}, 404
+    try:
+        property_id = int(data['property_id'])
+    except (TypeError, ValueError):
+        return {"error": "Invalid property_id"}, 400
     
     from datetime import datetime
     check_in = datetime.strptime(data['check_in_date'], '%Y-%m-%d').date()
     check_out = datetime.strptime(data['check_out_date'], '%Y-%m-%d').date()
     days = (check_out - check_in).days
+    if days <= 0:
+        return {"error": "check_out_date must be after check_in_date"}, 400
+
+    # Reject dates we already know are taken without waiting on the lock
+    if indexed_conflict(property_id, check_in, check_out) is not None:
+        return {"error": "Property is not available for the selected dates"}, 409
+
+    # Serialise reservations for this property until commit
+    property = lock_property(property_id)
+    if not property:
+        db.session.rollback()
+        return {"error": "Property not found"}, 404
+
+    if locked_conflict(property.id, check_in, check_out) is not None:
+        db.session.rollback()
+        return {"error": "Property is not available for the selected dates"}, 409
+
+    # Calculate total price
     total_price = property.price_per_night * days
     
     booking = Booking(
-    property_id=data['property_id'],
+    property_id=property.id,
     guest_name=current_user.name,    #
     guest_email=current_user.email,  
     check_in_date=check_in,
@@ -122,15 +204,20 @@ def create_booking():
 )
     
     db.session.add(booking)
+    occupancy.book(booking)
     db.session.commit()
+    stay_index.add(booking)
+    response_cache.invalidate_property(booking.property_id)
     
     return booking.to_dict(), 201
 
 # Owners endpoints
 @app.route('/api/owners', methods=['GET'])
 def get_owners():
-    owners = Owner.query.all()
-    return [owner.to_dict() for owner in owners]
+    try:
+        return paginate(Owner.query, (Owner.created_at, Owner.id), request.args)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return {"error": str(e)}, 400
 
 @app.route('/api/owners', methods=['POST'])
 def create_owner():
@@ -152,19 +239,11 @@ def create_owner():
 
 # FIXED: Complete Properties CRUD
 @app.route('/api/properties', methods=['POST'])
-@jwt_required()
+@claims_required('owner', "Only owners can create properties")
 def create_property():
     try:
         data = request.get_json()
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        # Check if user exists and is an owner
-        if not current_user:
-            return {"error": "User not found"}, 401
-            
-        if current_user.user_type != 'owner':
-            return {"error": "Only owners can create properties"}, 403
+        current_user_id = current_identity().id
         
         # Validate required fields
         required_fields = ['name', 'description', 'location', 'price_per_night', 'max_guests']
@@ -184,11 +263,12 @@ def create_property():
         
         db.session.add(property)
         db.session.commit()
+        response_cache.invalidate_property(property.id, membership=True)
         
         return property.to_dict(), 201
     except Exception as e:
         db.session.rollback()
-        print(f"Property creation error: {str(e)}")  # Debug logging
+        log.exception('Property creation failed')
         return {"error": f"Failed to create property: {str(e)}"}, 500
 
 @app.route('/api/properties/<int:id>', methods=['PATCH'])
@@ -212,6 +292,7 @@ def update_property(id):
                 setattr(property, key, value)
                 
         db.session.commit()
+        response_cache.invalidate_property(property.id)
         return property.to_dict(), 200
     except Exception as e:
         db.session.rollback()
@@ -222,8 +303,12 @@ def update_property(id):
 @jwt_required()  
 def get_bookings():
     try:
-        bookings = Booking.query.all()
-        return [booking.to_dict() for booking in bookings]
+        fields = requested_fields(request.args)
+        rows = booking_serializer.serializer('default', fields)
+        query = load_profile(Booking.query, 'booking_list', fields)
+        return paginate(query, BOOKING_ORDER, request.args, rows)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         return {"error": str(e)}, 500
 
@@ -234,10 +319,29 @@ def update_booking(id):
         return {"error": "Booking not found"}, 404
     
     data = request.get_json()
+    was_confirmed = booking.booking_status == 'confirmed'
     if 'booking_status' in data:
-        booking.booking_status = data['booking_status']
+        if data['booking_status'] == 'confirmed' and not was_confirmed:
+            # Re-confirming takes the same per-property lock as a new booking
+            lock_property(booking.property_id)
+            conflict = locked_conflict(booking.property_id, booking.check_in_date, booking.check_out_date)
+            if conflict is not None:
+                db.session.rollback()
+                return {"error": "Property is not available for the selected dates"}, 409
+        if was_confirmed and data['booking_status'] != 'confirmed':
+            if release_confirmed(booking, data['booking_status']):
+                occupancy.release(booking)
+        else:
+            booking.booking_status = data['booking_status']
+            if not was_confirmed and booking.booking_status == 'confirmed':
+                occupancy.book(booking)
     
     db.session.commit()
+    response_cache.invalidate_property(booking.property_id)
+    if was_confirmed and booking.booking_status != 'confirmed':
+        stay_index.remove(booking)
+    elif not was_confirmed and booking.booking_status == 'confirmed':
+        stay_index.add(booking)
     return booking.to_dict()
 
 # Property bookings
@@ -247,7 +351,27 @@ def get_property_bookings(id):
     if not property:
         return {"error": "Property not found"}, 404
     
-    return [booking.to_dict() for booking in property.bookings]
+    rows = booking_serializer.serializer('default', requested_fields(request.args))
+    return [rows(booking) for booking in property.bookings]
+
+# Booked nights as one string, for availability calendars
+@app.route('/api/properties/<int:id>/calendar', methods=['GET'])
+@response_cache.cached('property:{id}')
+def get_property_calendar(id):
+    try:
+        start, end = occupancy.parse_range(request.args)
+        if db.session.query(Property.id).filter_by(id=id).first() is None:
+            return {"error": "Property not found"}, 404
+        return {
+            "property_id": id,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "nights": occupancy.nights(id, start, end),
+        }
+    except InvalidRange as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        return {"error": str(e)}, 500
 
 # Upload property images
 @app.route('/api/properties/<int:property_id>/images', methods=['POST'])
@@ -256,38 +380,50 @@ def upload_property_images(property_id):
     if not property:
         return {"error": "Property not found"}, 404
     
+    # File parts stream into the image store while the body is parsed (uploads.py)
+    incoming = image_store.incoming_folder()
+    request.upload_directory = incoming
+
     if 'images' not in request.files:
         return {"error": "No images provided"}, 400
-    
+
     files = request.files.getlist('images')
     uploaded_images = []
-    
-    for i, file in enumerate(files):
-        if file and file.filename != '' and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            
-            property_folder = os.path.join(app.config['UPLOAD_FOLDER'], str(property_id))
-            os.makedirs(property_folder, exist_ok=True)
-            
-            file_path = os.path.join(property_folder, unique_filename)
-            file.save(file_path)
-            
-            image_url = f"/uploads/properties/{property_id}/{unique_filename}"
-            is_featured = i == 0 and PropertyImage.query.filter_by(property_id=property_id).count() == 0
-            
-            property_image = PropertyImage(
-                property_id=property_id,
-                image_url=image_url,
-                image_name=unique_filename,
-                is_featured=is_featured,
-                upload_order=PropertyImage.query.filter_by(property_id=property_id).count()
-            )
-            
-            db.session.add(property_image)
-            uploaded_images.append(property_image)
-    
-    db.session.commit()
+    existing = PropertyImage.query.filter_by(property_id=property_id).count()
+
+    try:
+        for file in files:
+            if file and file.filename != '' and allowed_file(file.filename):
+                extension = file.filename.rsplit('.', 1)[1].lower()  # checked by allowed_file
+
+                # Stored once per distinct content; a duplicate only gains a reference
+                stored_name = image_store.add(streamed(file, incoming), extension)
+
+                image_url = f"/uploads/properties/{property_id}/{stored_name}"
+                position = existing + len(uploaded_images)
+
+                property_image = PropertyImage(
+                    property_id=property_id,
+                    image_url=image_url,
+                    image_name=stored_name,
+                    is_featured=position == 0,
+                    upload_order=position,
+                    content_hash=stored_name.split('.', 1)[0],
+                    derivatives_status='pending' if derivatives.enabled() else None
+                )
+
+                db.session.add(property_image)
+                uploaded_images.append(property_image)
+
+        property.refresh_featured_image()
+        db.session.commit()
+    except Exception as e:
+        # Files already stored are left for the image store's sweep
+        db.session.rollback()
+        log.exception('Image upload failed for property %s', property_id)
+        return {"error": str(e)}, 500
+    response_cache.invalidate_property(property_id)
+    derivative_queue.enqueue([img.id for img in uploaded_images])
     return {"message": f"Uploaded {len(uploaded_images)} images", 
             "images": [img.to_dict() for img in uploaded_images]}, 201
 
@@ -295,7 +431,8 @@ def upload_property_images(property_id):
 @app.route('/api/properties/<int:property_id>/images', methods=['GET'])
 def get_property_images(property_id):
     images = PropertyImage.query.filter_by(property_id=property_id).order_by(PropertyImage.upload_order).all()
-    return [image.to_dict() for image in images]
+    rows = image_serializer.serializer('default', requested_fields(request.args))
+    return [rows(image) for image in images]
 
 # Delete specific image
 @app.route('/api/properties/images/<int:image_id>', methods=['DELETE'])
@@ -304,19 +441,27 @@ def delete_property_image(image_id):
     if not image:
         return {"error": "Image not found"}, 404
     
-    # Delete physical file
-    file_path = os.path.join('uploads/properties', str(image.property_id), image.image_name)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    # Release the stored file; unreferenced files are swept later
+    image_store.release(image)
     
+    property = image.property
     db.session.delete(image)
+    db.session.flush()
+    property.refresh_featured_image()
     db.session.commit()
+    response_cache.invalidate_property(property.id)
     return {"message": "Image deleted successfully"}
 
 # Serve uploaded files
 @app.route('/uploads/properties/<int:property_id>/<filename>')
 def uploaded_file(property_id, filename):
-    return send_from_directory(os.path.join(app.config['UPLOAD_FOLDER'], str(property_id)), filename)
+    folder = image_store.image_folder(property_id, filename)
+    # ?w=<pixels> picks the smallest resized copy at least that wide
+    width = request.args.get('w', type=int)
+    # Only an explicit image/webp counts; */* alone says nothing about WebP support
+    webp = any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes)
+    served = derivatives.best_variant(folder, filename, width, webp)
+    return send_image(folder, filename, served, negotiated=bool(width or webp))
 
 # Email validation helper function
 def is_valid_email(email):
@@ -373,7 +518,8 @@ def register():
         db.session.commit()
         
         # FIXED: Create access token with string identity
-        access_token = create_access_token(identity=str(new_user.id))
+        access_token = create_access_token(identity=str(new_user.id),
+                                           additional_claims=profile_claims(new_user))
         
         # Return success response
         return jsonify({
@@ -387,8 +533,11 @@ def register():
             }
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
-        print(f"Registration error: {str(e)}")  # Debug logging
+        auth_log.exception('Registration failed')
         db.session.rollback()
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
 
@@ -397,7 +546,6 @@ def login():
     try:
         # Get data from request
         data = request.get_json()
-        print(f"DEBUG: Login attempt with data: {data}")  # Debug logging
         
         # Validate required fields
         if not data:
@@ -409,25 +557,30 @@ def login():
         if not email or not password:
             return jsonify({'error': 'Email and password are required'}), 400
         
-        print(f"DEBUG: Looking for user with email: {email}")  # Debug logging
+        auth_log.debug('Login attempt', extra={'email': email})
         
         # Find user by email
         user = User.query.filter_by(email=email).first()
-        print(f"DEBUG: User found: {user is not None}")  # Debug logging
         
         # Check if user exists and password is correct
         if not user:
-            print("DEBUG: User not found")  # Debug logging
+            auth_log.info('Login failed', extra={'email': email, 'reason': 'unknown_email'})
             return jsonify({'error': 'Invalid email or password'}), 401
             
         if not user.check_password(password):
-            print("DEBUG: Password check failed")  # Debug logging
+            auth_log.info('Login failed', extra={'email': email, 'reason': 'bad_password'})
             return jsonify({'error': 'Invalid email or password'}), 401
         
-        print(f"DEBUG: Login successful for user: {user.email}")  # Debug logging
+        auth_log.debug('Login succeeded', extra={'user_id': user.id})
+        
+        # Upgrade hashes made with an older method or cost
+        if user.password_needs_rehash():
+            user.set_password(password)
+            db.session.commit()
         
         # Create access token with user ID as string
-        access_token = create_access_token(identity=str(user.id))  # Convert to string
+        access_token = create_access_token(identity=str(user.id),  # Convert to string
+                                           additional_claims=profile_claims(user))
         
         # Return success response
         return jsonify({
@@ -441,8 +594,11 @@ def login():
             }
         }), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
-        print(f"Login error: {str(e)}")  # Debug logging
+        auth_log.exception('Login failed with an error')
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
 @app.route('/api/verify', methods=['GET'])
@@ -451,17 +607,17 @@ def verify():
     try:
         # Get current user ID from JWT token
         current_user_id = get_jwt_identity()
-        print(f"DEBUG: Verify - JWT identity: {current_user_id}, type: {type(current_user_id)}")
+        auth_log.debug('Verify', extra={'jwt_identity': current_user_id})
         
         # Convert to int if it's a string
         if isinstance(current_user_id, str):
             current_user_id = int(current_user_id)
         
         # Find user by ID
-        user = User.query.get(current_user_id)
+        user = current_identity()
         
         if not user:
-            print(f"DEBUG: User not found for ID: {current_user_id}")
+            auth_log.info('Token for unknown user', extra={'user_id': current_user_id})
             return jsonify({'error': 'User not found'}), 404
         
         # Return success response with user info
@@ -476,7 +632,7 @@ def verify():
         }), 200
         
     except Exception as e:
-        print(f"DEBUG: Verify error: {str(e)}")
+        auth_log.warning('Token verification failed: %s', e)
         return jsonify({'error': 'Token verification failed'}), 401
 
 @app.route('/api/logout', methods=['POST'])
@@ -492,27 +648,26 @@ def logout():
 def get_profile():
     try:
         current_user_id = get_jwt_identity()
-        print(f"DEBUG: Profile - JWT identity: {current_user_id}, type: {type(current_user_id)}")
+        auth_log.debug('Profile', extra={'jwt_identity': current_user_id})
         
         # Handle both string and int JWT identities
         if isinstance(current_user_id, str):
             try:
                 current_user_id = int(current_user_id)
             except ValueError:
-                print(f"DEBUG: Cannot convert JWT identity to int: {current_user_id}")
+                auth_log.info('Non-numeric JWT identity', extra={'jwt_identity': current_user_id})
                 return jsonify({'error': 'Invalid token format'}), 422
         
         if current_user_id is None:
-            print("DEBUG: JWT identity is None")
+            auth_log.info('JWT without identity')
             return jsonify({'error': 'Token missing or invalid'}), 401
         
-        current_user = User.query.get(current_user_id)
+        current_user = current_identity()
         
         if not current_user:
-            print(f"DEBUG: User not found for ID: {current_user_id}")
+            auth_log.info('Token for unknown user', extra={'user_id': current_user_id})
             return jsonify({'error': 'User not found'}), 404
         
-        print(f"DEBUG: Found user: {current_user.email}, type: {current_user.user_type}")
         
         return jsonify({
             'user': {
@@ -525,7 +680,7 @@ def get_profile():
         }), 200
         
     except Exception as e:
-        print(f"DEBUG: Profile error: {str(e)}")
+        auth_log.exception('Profile lookup failed')
         return jsonify({'error': f'Failed to get profile: {str(e)}'}), 500
 
 # Update User Profile Route
@@ -564,10 +719,15 @@ def update_profile():
             else:
                 return jsonify({'error': 'Password must be at least 6 characters long'}), 400
         
+        # Tokens issued before this update now carry stale claims
+        current_user.profile_version += 1
         db.session.commit()
+        identities.refresh(current_user)
         
         return jsonify({
             'message': 'Profile updated successfully',
+            'access_token': create_access_token(identity=str(current_user.id),
+                                                additional_claims=profile_claims(current_user)),
             'user': {
                 'id': current_user.id,
                 'email': current_user.email,
@@ -576,20 +736,29 @@ def update_profile():
             }
         }), 200
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
-        print(f"DEBUG: Profile update error: {str(e)}")
+        auth_log.exception('Profile update failed')
         return jsonify({'error': 'Failed to update profile'}), 500
 
+# Bad pagination or sparse fieldset parameters
+@app.errorhandler(InvalidPageRequest)
+@app.errorhandler(InvalidFields)
+def handle_invalid_list_params(e):
+    return {"error": str(e)}, 400
+
 # IMPROVED Error handlers for JWT errors
 @app.errorhandler(422)
 def handle_unprocessable_entity(e):
-    print(f"DEBUG: 422 JWT Error: {str(e)}")
+    auth_log.info('Rejected token: %s', e, extra={'status': 422})
     return jsonify({'error': 'Invalid token format or malformed JWT. Please login again.'}), 422
 
 @app.errorhandler(401)
 def handle_unauthorized(e):
-    print(f"DEBUG: 401 JWT Error: {str(e)}")
+    auth_log.info('Rejected token: %s', e, extra={'status': 401})
     return jsonify({'error': 'Token is invalid or expired. Please login again.'}), 401
 
 @app.route('/api/properties/<int:id>', methods=['DELETE'])
@@ -610,13 +779,13 @@ def delete_property(id):
         
         # Delete associated images
         for image in property.images:
-            # Delete physical files if they exist
-            file_path = os.path.join('uploads/properties', str(property.id), image.image_name)
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # Release stored files; unreferenced files are swept later
+            image_store.release(image)
         
         db.session.delete(property)
         db.session.commit()
+        stay_index.invalidate(id)
+        response_cache.invalidate_property(id, membership=True)
         return {"message": "Property deleted successfully"}, 200
     except Exception as e:
         db.session.rollback()
@@ -641,7 +810,9 @@ def add_property_image_url(property_id):
     )
     
     db.session.add(property_image)
+    property.refresh_featured_image()
     db.session.commit()
+    response_cache.invalidate_property(property_id)
     
     return property_image.to_dict(), 201
 
@@ -658,8 +829,12 @@ def get_owner_properties(owner_id):
         if current_user_id != owner_id:
             return {"error": "Unauthorized access"}, 403
         
-        properties = Property.query.filter_by(owner_id=owner_id).all()
-        return [property.to_dict() for property in properties]
+        fields = requested_fields(request.args)
+        cards = property_serializer.serializer('owner_dashboard', fields)
+        properties = load_profile(Property.query, 'owner_dashboard', fields).filter_by(owner_id=owner_id).all()
+        return [cards(property) for property in properties]
+    except InvalidFields as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         return {"error": f"Failed to get properties: {str(e)}"}, 500
 
@@ -671,7 +846,7 @@ def cancel_booking(booking_id):
         if isinstance(current_user_id, str):
             current_user_id = int(current_user_id)
             
-        current_user = User.query.get(current_user_id)
+        current_user = current_identity()
         if not current_user:
             return {"error": "User not found"}, 401
         
@@ -683,8 +858,14 @@ def cancel_booking(booking_id):
         if booking.guest_email != current_user.email:
             return {"error": "Unauthorized"}, 403
             
+        # Only the cancel that flips the status frees the nights, so a repeated
+        # cancel cannot clear a stay booked for them in between
+        if release_confirmed(booking):
+            occupancy.release(booking)
         booking.booking_status = "cancelled"
         db.session.commit()
+        stay_index.remove(booking)
+        response_cache.invalidate_property(booking.property_id)
         
         return booking.to_dict(), 200
     except Exception as e:
@@ -699,36 +880,35 @@ def get_user_bookings():
         if isinstance(current_user_id, str):
             current_user_id = int(current_user_id)
             
-        current_user = User.query.get(current_user_id)
+        current_user = current_identity()
         if not current_user:
             return {"error": "User not found"}, 401
             
         # Return bookings where guest_email matches current user
-        bookings = Booking.query.filter_by(guest_email=current_user.email).all()
-        return [booking.to_dict() for booking in bookings]
+        fields = requested_fields(request.args)
+        rows = booking_serializer.serializer('default', fields)
+        bookings = load_profile(Booking.query, 'booking_list', fields).filter_by(guest_email=current_user.email).all()
+        return [rows(booking) for booking in bookings]
+    except InvalidFields as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         return {"error": str(e)}, 500
 
 # Get bookings for owner's properties  
 @app.route('/api/owner/bookings', methods=['GET'])
-@jwt_required()
+@claims_required('owner', "Owner access required")
 def get_owner_bookings():
     try:
-        current_user_id = get_jwt_identity()
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-            
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.user_type != 'owner':
-            return {"error": "Owner access required"}, 403
+        current_user_id = current_identity().id
             
-        # Get all properties owned by current user
-        owner_properties = Property.query.filter_by(owner_id=current_user_id).all()
-        property_ids = [p.id for p in owner_properties]
-        
-        # Get all bookings for those properties
-        bookings = Booking.query.filter(Booking.property_id.in_(property_ids)).all()
-        return [booking.to_dict() for booking in bookings]
+        # Bookings for every property owned by current user, in one query
+        fields = requested_fields(request.args)
+        rows = booking_serializer.serializer('default', fields)
+        bookings = load_profile(Booking.query, 'booking_list', fields)
+        bookings = bookings.join(Property).filter(Property.owner_id == current_user_id)
+        return paginate(bookings, BOOKING_ORDER, request.args, rows)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         return {"error": str(e)}, 500
 
@@ -741,7 +921,7 @@ def get_user_favorites():
         if isinstance(current_user_id, str):
             current_user_id = int(current_user_id)
             
-        current_user = User.query.get(current_user_id)
+        current_user = current_identity()
         if not current_user:
             return {"error": "User not found"}, 401
         
@@ -759,7 +939,7 @@ def add_favorite():
         if isinstance(current_user_id, str):
             current_user_id = int(current_user_id)
             
-        current_user = User.query.get(current_user_id)
+        current_user = current_identity()
         if not current_user:
             return {"error": "User not found"}, 401
             
@@ -806,7 +986,7 @@ def remove_favorite(property_id):
         if isinstance(current_user_id, str):
             current_user_id = int(current_user_id)
             
-        current_user = User.query.get(current_user_id)
+        current_user = current_identity()
         if not current_user:
             return {"error": "User not found"}, 401
             
@@ -832,23 +1012,19 @@ def get_available_properties():
         data = request.get_json()
         check_in = datetime.strptime(data['check_in_date'], '%Y-%m-%d').date()
         check_out = datetime.strptime(data['check_out_date'], '%Y-%m-%d').date()
-        
-        # Get all properties
-        all_properties = Property.query.all()
-        available_properties = []
-        
-        for property in all_properties:
-            # Check if property has conflicting bookings
-            conflicting_bookings = Booking.query.filter(
-                Booking.property_id == property.id,
-                Booking.booking_status == 'confirmed',
-                ~((Booking.check_out_date <= check_in) | (Booking.check_in_date >= check_out))
-            ).first()
-            
-            if not conflicting_bookings:
-                available_properties.append(property)
-        
-        return [property.to_dict() for property in available_properties]
+
+        if check_out <= check_in:
+            return {"error": "check_out_date must be after check_in_date"}, 400
+
+        # Single anti-join instead of one conflict query per property
+        query = available_properties_query(check_in, check_out)
+        fields = requested_fields(request.args)
+        cards = property_serializer.serializer('card', fields)
+        query = load_profile(query, 'listing', fields)
+        # Page arguments in the query string win over the body (see pagination.py)
+        return paginate(query, AVAILABILITY_ORDER, {**data, **request.args.to_dict()}, cards)
+    except (InvalidPageRequest, InvalidFields) as e:
+        return {"error": str(e)}, 400
     except Exception as e:
         return {"error": str(e)}, 500
 
@@ -864,6 +1040,9 @@ def seed_database_route():
     """
     try:
         seed_database()
+        stay_index.invalidate()
+        response_cache.clear()
+        identities.invalidate()
         return jsonify({
             "message": "Database seeded successfully!",
             "users": User.query.count(),
@@ -871,13 +1050,13 @@ def seed_database_route():
             "bookings": Booking.query.count()
         }), 200
     except Exception as e:
-        print(f"Seeding error: {str(e)}")
+        log.exception('Seeding failed')
         return jsonify({"error": f"Seeding failed: {str(e)}"}), 500
 
 def init_db():
     with app.app_context():
         db.create_all()  # Recreate with new schema
-        print("Database tables recreated with updated schema!")    
+        log.info('Database tables recreated with updated schema')    
 
 if __name__ == '__main__':
       init_db()
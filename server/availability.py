@@ -0,0 +1,39 @@
+"""
+Availability engine: which properties are free between two dates.
+
+Stays are half-open intervals [check_in, check_out), so a guest checking out
+on the 5th does not block a guest checking in on the 5th.
+"""
+
+from sqlalchemy import and_
+
+from config import db
+from models import Property, Booking
+
+# Stable listing order for availability results. Walking the primary key lets
+# the database stop as soon as a page worth of free properties is found.
+AVAILABILITY_ORDER = (Property.id,)
+
+
+def overlaps_stay(check_in, check_out):
+    """SQL criterion matching confirmed bookings that overlap the stay."""
+    return and_(
+        Booking.booking_status == 'confirmed',
+        Booking.check_in_date < check_out,
+        Booking.check_out_date > check_in,
+    )
+
+
+def available_properties_query(check_in, check_out):
+    """
+    Properties with no confirmed booking overlapping [check_in, check_out).
+
+    Compiles to a single ``NOT EXISTS`` anti-join, so the cost of a search
+    no longer grows with one conflict query per property.
+    """
+    conflict = (
+        db.session.query(Booking.id)
+        .filter(Booking.property_id == Property.id, overlaps_stay(check_in, check_out))
+        .exists()
+    )
+    return Property.query.filter(~conflict)
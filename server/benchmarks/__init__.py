@@ -0,0 +1,7 @@
+"""
+Offline benchmarks for the JamboStays API.
+
+Run from the ``server`` directory, e.g. ``python -m benchmarks.availability``.
+Each benchmark points the app at its own throwaway database via
+``DATABASE_URL`` before importing it, so it never touches jambostays.db.
+"""
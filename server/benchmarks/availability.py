@@ -0,0 +1,90 @@
+"""
+Availability search benchmark.
+
+Loads increasingly large catalogues and checks that one page of
+``POST /api/properties/available`` issues the same number of SQL statements
+at every scale. Exits non-zero if the count grows with the catalogue.
+
+    python -m benchmarks.availability --scales 1000x20 10000x200
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import use_database, bulk_load, count_queries
+
+
+def parse_scale(value):
+    properties, bookings = value.lower().split('x')
+    return int(properties), int(bookings)
+
+
+def run(app, db, properties, bookings_per_property, repeat, limit):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        bulk_load(db, properties, bookings_per_property)
+        load_seconds = time.perf_counter() - started
+
+        client = app.test_client()
+        check_in = date.today() + timedelta(days=10)
+        body = {
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=3)).isoformat(),
+            'limit': limit,
+        }
+
+        with count_queries(db.engine) as statements:
+            response = client.post('/api/properties/available', json=body)
+        if response.status_code != 200:
+            raise SystemExit(f'availability search failed: {response.get_json()}')
+        query_count = len(statements)
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.post('/api/properties/available', json=body)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+
+    return {
+        'properties': properties,
+        'bookings': (properties + 1) // 2 * bookings_per_property,
+        'load_s': load_seconds,
+        'queries': query_count,
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'max_ms': timings[-1] * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', nargs='+', type=parse_scale, default=[(1000, 20), (10000, 200)],
+                        help='PROPERTIESxBOOKINGS_PER_BOOKED_PROPERTY; half the properties are '
+                             'booked, so 10000x200 loads 1M bookings')
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    app, db = use_database(args.database_url)
+
+    results = [run(app, db, p, b, args.repeat, args.limit) for p, b in args.scales]
+
+    print(f"{'properties':>10} {'bookings':>10} {'load s':>8} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+    for r in results:
+        print(f"{r['properties']:>10} {r['bookings']:>10} {r['load_s']:>8.1f} {r['queries']:>8} "
+              f"{r['p50_ms']:>8.1f} {r['max_ms']:>8.1f}")
+
+    if len({r['queries'] for r in results}) > 1:
+        print('FAIL: query count depends on catalogue size')
+        return 1
+    print('OK: query count is constant across scales')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Concurrent booking stress test.
+
+Fires bursts of simultaneous ``POST /api/bookings`` requests for overlapping
+dates on the same property and verifies that no two confirmed bookings
+overlap afterwards. Exits non-zero on any double-booking.
+
+    python -m benchmarks.booking_race --threads 32 --rounds 20
+    python -m benchmarks.booking_race --database-url postgresql+psycopg://localhost/jambostays_bench
+"""
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from benchmarks.common import use_database
+
+
+def setup(app, db, properties):
+    from models import Owner, Property
+
+    client = app.test_client()
+    response = client.post('/api/register', json={
+        'email': 'racer@bench.test', 'password': 'password123', 'name': 'Race Guest',
+    })
+    token = response.get_json()['access_token']
+
+    with app.app_context():
+        db.session.add(Owner(id=1, name='Bench Owner', email='bench@jambostays.com'))
+        for i in range(1, properties + 1):
+            db.session.add(Property(
+                id=i, name=f'Race Property {i}', description='Race', location='Mombasa, Kenya',
+                price_per_night=100.0, max_guests=2, owner_id=1,
+            ))
+        db.session.commit()
+    return token
+
+
+def burst(app, token, property_id, threads, check_in):
+    barrier = threading.Barrier(threads)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def worker(offset):
+        client = app.test_client()
+        # Every request overlaps every other: all cover the night of check_in + 2
+        body = {
+            'property_id': property_id,
+            'check_in_date': (check_in + timedelta(days=offset % 3)).isoformat(),
+            'check_out_date': (check_in + timedelta(days=3 + offset % 2)).isoformat(),
+        }
+        barrier.wait()
+        response = client.post('/api/bookings', json=body,
+                               headers={'Authorization': f'Bearer {token}'})
+        with lock:
+            statuses[response.status_code] += 1
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return statuses
+
+
+def double_bookings(app, db):
+    from sqlalchemy.orm import aliased
+    from models import Booking
+
+    with app.app_context():
+        other = aliased(Booking)
+        return (
+            db.session.query(Booking.id, other.id)
+            .join(other, (other.property_id == Booking.property_id) & (other.id > Booking.id))
+            .filter(
+                Booking.booking_status == 'confirmed',
+                other.booking_status == 'confirmed',
+                other.check_in_date < Booking.check_out_date,
+                other.check_out_date > Booking.check_in_date,
+            )
+            .all()
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--properties', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    app, db = use_database(args.database_url)
+    token = setup(app, db, args.properties)
+
+    totals = Counter()
+    started = time.perf_counter()
+    for round_number in range(args.rounds):
+        property_id = round_number % args.properties + 1
+        check_in = date.today() + timedelta(days=30 + 10 * round_number)
+        totals.update(burst(app, token, property_id, args.threads, check_in))
+    elapsed = time.perf_counter() - started
+
+    overlaps = double_bookings(app, db)
+    requests = args.threads * args.rounds
+    print(f'{requests} requests in {elapsed:.1f}s ({requests / elapsed:.0f} req/s)')
+    print('status codes:', dict(sorted(totals.items())))
+    if overlaps or totals[201] != args.rounds:
+        print(f'FAIL: {len(overlaps)} overlapping confirmed pairs, {totals[201]} bookings created '
+              f'(expected {args.rounds})')
+        return 1
+    print('OK: zero double-bookings')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Shared plumbing for the benchmarks: database bootstrap, bulk fixtures, a
+SQL statement counter and latency percentiles.
+"""
+
+import os
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+
+def use_database(url=None):
+    """
+    Point the app at ``url`` (or a fresh temporary SQLite file) and return
+    ``(app, db)``. Must run before anything imports ``config``.
+    """
+    if 'config' in sys.modules:
+        # The engine is already bound to DATABASE_URL; tables below would be dropped there
+        raise RuntimeError('use_database() must run before config is imported; '
+                           'import app modules inside functions, after it')
+    if url is None:
+        handle, path = tempfile.mkstemp(prefix='jambostays-bench-', suffix='.db')
+        os.close(handle)
+        url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = url
+
+    import app as app_module  # noqa: F401  (registers routes)
+    from config import app, db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app, db
+
+
+@contextmanager
+def count_queries(engine, with_parameters=False):
+    """
+    Collect every SQL statement executed on ``engine`` inside the block, as
+    ``(statement, parameters)`` pairs when ``with_parameters`` is set.
+    """
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters) if with_parameters else statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``; 0.0 for an empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def bulk_load(db, properties, bookings_per_property, images_per_property=0, seed=42, chunk=50000):
+    """
+    Insert ``properties`` rows plus ``bookings_per_property`` non-overlapping
+    confirmed stays for each odd-numbered property, using Core executemany
+    rather than the ORM. Even-numbered properties stay empty so every date
+    range has some availability. ``images_per_property`` image rows are added
+    to every property, the first one featured.
+    """
+    import occupancy
+    from geo import geocode
+    from models import Amenity, Owner, Property, PropertyAmenity, Booking, PropertyImage, amenity_names
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    start = date.today()
+    latitude, longitude = geocode('Nairobi, Kenya')
+
+    db.session.execute(Owner.__table__.insert(), [
+        {'id': 1, 'name': 'Bench Owner', 'email': 'bench@jambostays.com', 'created_at': now}
+    ])
+
+    property_rows = [{
+        'id': i,
+        'name': f'Bench Property {i}',
+        'description': 'Benchmark listing',
+        'location': 'Nairobi, Kenya',
+        # Spread over roughly 30 km around the centre
+        'latitude': latitude + rng.uniform(-0.15, 0.15),
+        'longitude': longitude + rng.uniform(-0.15, 0.15),
+        'price_per_night': float(rng.randint(50, 900)),
+        'max_guests': rng.randint(1, 10),
+        'amenities': 'WiFi, Kitchen',
+        'owner_id': 1,
+        'created_at': now,
+        'featured_image_url': f'https://images.example.test/{i}/0.jpg' if images_per_property else None,
+    } for i in range(1, properties + 1)]
+    for i in range(0, len(property_rows), chunk):
+        db.session.execute(Property.__table__.insert(), property_rows[i:i + chunk])
+
+    # Core inserts skip the ORM hook that indexes amenities
+    amenity_ids = Amenity.ids(db.session, amenity_names('WiFi, Kitchen'))
+    link_rows = [{'property_id': row['id'], 'amenity_id': amenity_id}
+                 for row in property_rows for amenity_id in amenity_ids.values()]
+    for i in range(0, len(link_rows), chunk):
+        db.session.execute(PropertyAmenity.__table__.insert(), link_rows[i:i + chunk])
+
+    image_rows = [{
+        'property_id': property_id,
+        'image_url': f'https://images.example.test/{property_id}/{n}.jpg',
+        'image_name': f'image_{n + 1}.jpg',
+        'is_featured': n == 0,
+        'upload_order': n,
+        'created_at': now,
+    } for property_id in range(1, properties + 1) for n in range(images_per_property)]
+    for i in range(0, len(image_rows), chunk):
+        db.session.execute(PropertyImage.__table__.insert(), image_rows[i:i + chunk])
+
+    batch = []
+    for property_id in range(1, properties + 1, 2):
+        day = start + timedelta(days=rng.randint(0, 6))
+        for _ in range(bookings_per_property):
+            nights = rng.randint(1, 7)
+            batch.append({
+                'property_id': property_id,
+                'guest_name': 'Bench Guest',
+                'guest_email': 'guest@bench.test',
+                'check_in_date': day,
+                'check_out_date': day + timedelta(days=nights),
+                'total_price': 100.0 * nights,
+                'booking_status': 'confirmed',
+                'created_at': now,
+            })
+            day += timedelta(days=nights + rng.randint(0, 3))
+        if len(batch) >= chunk:
+            db.session.execute(Booking.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Booking.__table__.insert(), batch)
+    occupancy.rebuild()
+    db.session.commit()
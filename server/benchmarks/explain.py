@@ -0,0 +1,88 @@
+"""
+Index usage check for every read endpoint.
+
+Captures the SELECTs each endpoint issues and runs them through the
+backend's planner: ``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN`` with
+sequential scans disabled on PostgreSQL. Fails if any filtered table is
+read with a full scan.
+
+    python -m benchmarks.explain
+    python -m benchmarks.explain --database-url postgresql+psycopg://localhost/jambostays_bench
+"""
+
+import argparse
+import re
+import sys
+
+from benchmarks.common import use_database, bulk_load, count_queries
+from benchmarks.query_counts import ENDPOINTS, tokens
+
+# A bare "SCAN <table>" in SQLite means no index is used at all; "SCAN t
+# USING INDEX" (an ordered walk) and "SEARCH" are fine.
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)\s*$')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+# The availability anti-join walks properties in primary-key order (SQLite
+# reports a rowid walk as a plain SCAN) and probes bookings by index.
+EXPECTED_SCANS = {
+    ('POST', '/api/properties/available'): {'properties'},
+}
+
+
+def plan(connection, dialect, statement, parameters):
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        lines = [row[-1] for row in rows]
+        return lines, [m.group(1) for m in map(SQLITE_FULL_SCAN.match, lines) if m]
+
+    connection.exec_driver_sql('SET enable_seqscan = off')
+    rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).fetchall()
+    lines = [row[0] for row in rows]
+    return lines, [m.group(1) for m in map(POSTGRES_FULL_SCAN.search, lines) if m]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args(argv)
+
+    app, db = use_database(args.database_url)
+    failures = []
+    with app.app_context():
+        client = app.test_client()
+        issued = tokens(client)
+        bulk_load(db, args.properties, 3, images_per_property=3)
+        dialect = db.engine.dialect.name
+
+        for method, url, role in ENDPOINTS:
+            headers = {'Authorization': f'Bearer {issued[role]}'} if role else {}
+            body = {'check_in_date': '2030-01-01', 'check_out_date': '2030-01-05'} if method == 'POST' else None
+            with count_queries(db.engine, with_parameters=True) as statements:
+                client.open(url, method=method, json=body, headers=headers)
+
+            with db.engine.connect() as connection:
+                for statement, parameters in statements:
+                    if not statement.lstrip().upper().startswith('SELECT'):
+                        continue
+                    lines, scanned = plan(connection, dialect, statement, parameters)
+                    scanned = [t for t in scanned if t not in EXPECTED_SCANS.get((method, url), ())]
+                    if args.verbose or scanned:
+                        print(f'{method} {url}\n  {" ".join(statement.split())[:160]}')
+                        for line in lines:
+                            print(f'    {line}')
+                    if scanned:
+                        failures.append((method, url, scanned))
+                connection.rollback()
+
+    for method, url, scanned in failures:
+        print(f'FULL SCAN: {method} {url} on {", ".join(scanned)}')
+    if failures:
+        return 1
+    print(f'OK: every endpoint query uses an index on {dialect}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Load benchmark for the main API flows.
+
+Loads a synthetic dataset and drives each scenario with concurrent
+clients, either through the Flask test client (``--driver client``, no
+sockets) or over HTTP against the app served by a threaded WSGI server on
+a local port (``--driver server``). For each scenario it reports
+throughput, p50/p95/p99 latency and SQL statements per request.
+
+    python -m benchmarks.load
+    python -m benchmarks.load --driver server --concurrency 8 --requests 400
+    python -m benchmarks.load --database-url postgresql+psycopg://localhost/jambostays_bench
+    python -m benchmarks.load --save baseline.json
+    python -m benchmarks.load --compare baseline.json --tolerance 0.25
+
+``--compare`` exits non-zero when a scenario's p95 grows by more than the
+tolerance or it issues more SQL per request than the baseline.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import use_database, bulk_load, count_queries, percentile
+
+PASSWORD = 'password123'
+# SQL statements per request a scenario may gain before --compare fails
+SQL_MARGIN = 0.25
+SCENARIOS = ('listing', 'detail', 'availability', 'booking', 'login', 'favorites')
+
+
+class Scenario:
+    """Builds the requests for unit ``n`` of a run; ``ok`` lists the expected statuses."""
+
+    def __init__(self, name, build, ok=(200,)):
+        self.name = name
+        self.build = build
+        self.ok = ok
+
+
+def scenarios(properties, tokens):
+    guest = {'Authorization': f"Bearer {tokens['guest']}"}
+    far_future = date.today() + timedelta(days=3650)
+
+    def stay(n, nights=3):
+        check_in = date.today() + timedelta(days=30 + (n * 7) % 300)
+        return {'check_in_date': check_in.isoformat(),
+                'check_out_date': (check_in + timedelta(days=nights)).isoformat(),
+                'limit': 20}
+
+    def booking(n):
+        # Spread over the properties; a property's stays never overlap
+        check_in = far_future + timedelta(days=4 * (n // properties))
+        return [('POST', '/api/bookings', {
+            'property_id': n % properties + 1,
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=3)).isoformat(),
+        }, guest)]
+
+    def favorites(n):
+        property_id = n % properties + 1
+        return [('POST', '/api/user/favorites', {'property_id': property_id}, guest),
+                ('GET', '/api/user/favorites', None, guest),
+                ('DELETE', f'/api/user/favorites/{property_id}', None, guest)]
+
+    return {
+        'listing': Scenario('listing', lambda n: [('GET', '/api/properties?limit=20', None, {})]),
+        'detail': Scenario('detail', lambda n: [('GET', f'/api/properties/{n % properties + 1}', None, {})]),
+        'availability': Scenario('availability', lambda n: [
+            ('POST', '/api/properties/available', stay(n), {})]),
+        'booking': Scenario('booking', booking, ok=(201,)),
+        'login': Scenario('login', lambda n: [
+            ('POST', '/api/login', {'email': 'guest@bench.test', 'password': PASSWORD}, {})]),
+        'favorites': Scenario('favorites', favorites, ok=(200, 201)),
+    }
+
+
+class ClientDriver:
+    """Requests through the Flask test client: no network, one client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, body, headers):
+            return client.open(path, method=method, json=body, headers=headers).status_code
+        return send
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """Requests over keep-alive HTTP to the app served by werkzeug's threaded server."""
+
+    def __init__(self, app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def session(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+
+        def send(method, path, body, headers):
+            payload = json.dumps(body) if body is not None else None
+            headers = dict(headers, **({'Content-Type': 'application/json'} if payload else {}))
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        return send
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run(driver, engine, scenario, requests, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    units = itertools.count()
+    barrier = threading.Barrier(concurrency)
+
+    def worker():
+        nonlocal errors
+        send = driver.session()
+        barrier.wait()
+        while True:
+            n = next(units)
+            if n >= requests:
+                return
+            # A unit's requests run in order on one connection
+            for method, path, body, headers in scenario.build(n):
+                began = time.perf_counter()
+                status = send(method, path, body, headers)
+                elapsed = time.perf_counter() - began
+                with lock:
+                    latencies.append(elapsed)
+                    errors += status not in scenario.ok
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    with count_queries(engine) as statements:
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - began
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'sql_per_request': round(len(statements) / max(len(latencies), 1), 2),
+    }
+
+
+def register(app):
+    client = app.test_client()
+    response = client.post('/api/register', json={
+        'email': 'guest@bench.test', 'password': PASSWORD, 'name': 'Bench Guest',
+    })
+    if response.status_code != 201:
+        raise SystemExit(f'register -> {response.status_code}: {response.get_json()}')
+    return {'guest': response.get_json()['access_token']}
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            found.append(f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+        # Cache hits make cached scenarios' SQL counts vary a little run to run
+        if result['sql_per_request'] > before['sql_per_request'] + SQL_MARGIN:
+            found.append(f"{name}: SQL/request {before['sql_per_request']} -> {result['sql_per_request']}")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--driver', choices=('client', 'server'), default='client')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated subset')
+    parser.add_argument('--properties', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=10, help='bookings per booked property')
+    parser.add_argument('--images', type=int, default=3, help='images per property')
+    parser.add_argument('--requests', type=int, default=200, help='units per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='measure listing/detail without the response cache')
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON from --save')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth')
+    args = parser.parse_args(argv)
+
+    app, db = use_database(args.database_url)
+    with app.app_context():
+        bulk_load(db, args.properties, args.bookings, images_per_property=args.images)
+        engine = db.engine
+    tokens = register(app)
+    if args.no_response_cache:
+        from response_cache import response_cache
+        response_cache.backend = None
+
+    available = scenarios(args.properties, tokens)
+    driver = ServerDriver(app) if args.driver == 'server' else ClientDriver(app)
+    results = {}
+    try:
+        print(f"{'scenario':<13} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} "
+              f"{'p95 ms':>8} {'p99 ms':>8} {'SQL/req':>8}")
+        for name in args.scenarios.split(','):
+            result = results[name] = run(driver, engine, available[name], args.requests, args.concurrency)
+            print(f"{name:<13} {result['requests']:>8} {result['errors']:>6} {result['throughput']:>8} "
+                  f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+                  f"{result['sql_per_request']:>8}")
+    finally:
+        driver.close()
+
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump({'driver': args.driver, 'database': engine.dialect.name, 'results': results},
+                      handle, indent=2)
+
+    failures = [f'{name}: {result["errors"]} unexpected status codes'
+                for name, result in results.items() if result['errors']]
+    if args.compare:
+        with open(args.compare) as handle:
+            failures += regressions(results, json.load(handle)['results'], args.tolerance)
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
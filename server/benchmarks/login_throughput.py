@@ -0,0 +1,105 @@
+"""
+Login throughput at several concurrency levels.
+
+Registers a set of users, then has N threads log in repeatedly through
+``POST /api/login`` and reports logins per second and latency percentiles
+for each level. Compare hashing inline with hashing in the process pool:
+
+    python -m benchmarks.login_throughput --levels 1,4,16 --workers 0
+    python -m benchmarks.login_throughput --levels 1,4,16 --workers 4
+    python -m benchmarks.login_throughput --method pbkdf2:sha256:600000
+
+503 responses (hash pool full) are counted separately from failures.
+"""
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+
+from benchmarks.common import use_database, percentile
+
+PASSWORD = 'password123'
+
+
+def register(app, users):
+    client = app.test_client()
+    emails = [f'login{i}@bench.test' for i in range(users)]
+    for email in emails:
+        response = client.post('/api/register', json={'email': email, 'password': PASSWORD, 'name': 'Bench Login'})
+        if response.status_code != 201:
+            raise SystemExit(f'register {email} -> {response.status_code}: {response.get_json()}')
+    return emails
+
+
+def run_level(app, emails, concurrency, requests_per_thread):
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(concurrency)
+
+    def worker(offset):
+        client = app.test_client()
+        start.wait()
+        for i in range(requests_per_thread):
+            email = emails[(offset + i) % len(emails)]
+            began = time.perf_counter()
+            response = client.post('/api/login', json={'email': email, 'password': PASSWORD})
+            elapsed = time.perf_counter() - began
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+    return wall, latencies, statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--levels', default='1,4,16', help='comma-separated thread counts')
+    parser.add_argument('--requests', type=int, default=8, help='logins per thread per level')
+    parser.add_argument('--workers', type=int, help='hash pool processes (0 = inline; default from env)')
+    parser.add_argument('--method', help='werkzeug hash method, e.g. scrypt:16384:8:1')
+    args = parser.parse_args(argv)
+
+    app, db = use_database(args.database_url)
+    from passwords import hasher
+    if args.workers is not None or args.method:
+        hasher.configure(
+            method=args.method or hasher.method,
+            salt_length=hasher.salt_length,
+            workers=hasher.workers if args.workers is None else args.workers,
+            timeout=hasher.timeout,
+        )
+    print(f'method {hasher.prefix}, pool workers {hasher.workers}, max pending {hasher.max_pending}')
+
+    emails = register(app, args.users)
+    failures = 0
+    print(f"{'threads':>7} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'503':>5} {'failed':>6}")
+    for level in (int(n) for n in args.levels.split(',')):
+        wall, latencies, statuses = run_level(app, emails, level, args.requests)
+        busy = statuses.pop(503, 0)
+        failed = sum(count for status, count in statuses.items() if status != 200)
+        failures += failed
+        print(f'{level:>7} {statuses[200] / wall:>9.1f} {percentile(latencies, 0.50) * 1000:>8.1f} '
+              f'{percentile(latencies, 0.95) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} '
+              f'{busy:>5} {failed:>6}')
+
+    hasher.shutdown()
+    if failures:
+        print(f'FAIL: {failures} login(s) failed')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+SQL statement counts per request.
+
+Serves every read endpoint against a small and a large dataset and fails
+if any endpoint's statement count changes with the number of rows, which
+is the signature of a lazy-load N+1.
+
+    python -m benchmarks.query_counts --small 20 --large 200
+"""
+
+import argparse
+import sys
+
+from benchmarks.common import use_database, bulk_load, count_queries
+
+ENDPOINTS = [
+    ('GET', '/api/properties', None),
+    ('GET', '/api/properties?limit=50', None),
+    ('GET', '/api/properties?fields=id,name,bookings', None),
+    ('GET', '/api/properties/search?q=bench&amenities=wifi', None),
+    ('GET', '/api/properties/nearby?near=Nairobi', None),
+    ('GET', '/api/properties/1', None),
+    ('GET', '/api/properties/1/bookings', None),
+    ('GET', '/api/properties/1/calendar', None),
+    ('GET', '/api/properties/1/images', None),
+    ('GET', '/api/owners/1/properties', 'owner'),
+    ('GET', '/api/bookings', 'owner'),
+    ('GET', '/api/bookings?fields=id,property', 'owner'),
+    ('GET', '/api/owner/bookings', 'owner'),
+    ('GET', '/api/user/bookings', 'guest'),
+    ('GET', '/api/user/favorites', 'guest'),
+    ('POST', '/api/properties/available', None),
+]
+
+
+def tokens(client):
+    issued = {}
+    for role, email, user_type in (('owner', 'bench@jambostays.com', 'owner'),
+                                   ('guest', 'guest@bench.test', 'guest')):
+        response = client.post('/api/register', json={
+            'email': email, 'password': 'password123', 'name': f'Bench {role}', 'user_type': user_type,
+        })
+        issued[role] = response.get_json()['access_token']
+    return issued
+
+
+def profile(app, db, properties, bookings, images):
+    from identity import identities
+    from response_cache import response_cache
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        client = app.test_client()
+        issued = tokens(client)
+        bulk_load(db, properties, bookings, images_per_property=images)
+        # Measure the database work, not cache hits left over from the last run
+        response_cache.clear()
+        identities.invalidate()
+
+        counts = {}
+        for method, url, role in ENDPOINTS:
+            headers = {'Authorization': f'Bearer {issued[role]}'} if role else {}
+            body = {'check_in_date': '2030-01-01', 'check_out_date': '2030-01-05'} if method == 'POST' else None
+            with count_queries(db.engine) as statements:
+                response = client.open(url, method=method, json=body, headers=headers)
+            if response.status_code >= 400:
+                raise SystemExit(f'{method} {url} -> {response.status_code}: {response.get_json()}')
+            counts[(method, url)] = len(statements)
+        return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--small', type=int, default=20, help='properties in the small dataset')
+    parser.add_argument('--large', type=int, default=200, help='properties in the large dataset')
+    parser.add_argument('--bookings', type=int, default=3, help='bookings per booked property')
+    parser.add_argument('--images', type=int, default=3, help='images per property')
+    args = parser.parse_args(argv)
+
+    app, db = use_database(args.database_url)
+    small = profile(app, db, args.small, args.bookings, args.images)
+    large = profile(app, db, args.large, args.bookings, args.images)
+
+    failures = 0
+    print(f"{'endpoint':<50} {args.small:>6} {args.large:>6}")
+    for key in small:
+        flag = '' if small[key] == large[key] else '  <-- grows with rows'
+        failures += bool(flag)
+        print(f'{key[0] + " " + key[1]:<50} {small[key]:>6} {large[key]:>6}{flag}')
+
+    if failures:
+        print(f'FAIL: {failures} endpoint(s) issue more statements as rows grow')
+        return 1
+    print('OK: statement counts are independent of row count')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
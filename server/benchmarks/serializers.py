@@ -0,0 +1,63 @@
+"""
+Serializer micro-benchmark: SerializerMixin.to_dict against the compiled
+field plans in serializers.py, over a listing of properties.
+
+    python -m benchmarks.serializers --properties 1000
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.common import use_database, bulk_load, count_queries
+
+
+def measure(db, serialize, repeat, profile=None):
+    from loading import load_profile
+    from models import Property
+
+    timings, queries = [], 0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        with count_queries(db.engine) as statements:
+            started = time.perf_counter()
+            query = Property.query if profile is None else load_profile(Property.query, profile)
+            payload = [serialize(p) for p in query.order_by(Property.id).all()]
+            timings.append(time.perf_counter() - started)
+        queries = len(statements)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, queries, len(payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--properties', type=int, default=1000)
+    parser.add_argument('--bookings', type=int, default=4, help='bookings per booked property')
+    parser.add_argument('--images', type=int, default=3, help='images per property')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    app, db = use_database(args.database_url)
+    from serializers import property_serializer
+
+    with app.app_context():
+        bulk_load(db, args.properties, args.bookings, images_per_property=args.images)
+
+        cases = [
+            ('to_dict()', lambda p: p.to_dict(), None),
+            ('compiled card', property_serializer.serializer('card'), None),
+            ('compiled detail', property_serializer.serializer('detail'), None),
+            ('fields=id,name,price', property_serializer.serializer(
+                'card', ('id', 'name', 'price_per_night')), None),
+            ('card + listing profile', property_serializer.serializer('card'), 'listing'),
+        ]
+        print(f"{'serializer':<24} {'p50 ms':>9} {'queries':>8} {'rows':>6}")
+        for name, serialize, profile in cases:
+            p50, queries, rows = measure(db, serialize, args.repeat, profile)
+            print(f'{name:<24} {p50:>9.1f} {queries:>8} {rows:>6}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,6 @@
 # Remote library imports
 from datetime import timedelta
+import logging
 import os
 from werkzeug.utils import secure_filename
 from flask import Flask
@@ -8,12 +9,22 @@ from flask_migrate import Migrate
 from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
+from sqlalchemy.engine import make_url
 from flask_jwt_extended import JWTManager
 
 # Local imports
+from db_pool import engine_options, configure_engine
+from geo import register_functions
+from structured_logging import configure_logging
+from metrics import request_metrics
+from uploads import UploadRequest
 
 # Instantiate app, set attributes
 app = Flask(__name__)
+# Image uploads stream straight to disk (see uploads.py)
+app.request_class = UploadRequest
+configure_logging(app)
+log = logging.getLogger('jambostays.config')
 
 # Database configuration
 database_url = os.environ.get("DATABASE_URL") or "sqlite:///jambostays.db"
@@ -26,12 +37,21 @@ if database_url.startswith(('postgres://', 'postgresql://')):
         connection_string = database_url[13:]
     database_url = f"postgresql+psycopg://{connection_string}"
 
-print(f"DEBUG: Final database URL: {database_url}")  # Debug line - remove in production
+log.info('Database: %s', make_url(database_url).render_as_string(hide_password=True))
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
 app.json.compact = False
 
+# Seconds a worker trusts its in-memory booking index before reloading it
+app.config['STAY_INDEX_TTL'] = int(os.environ.get('STAY_INDEX_TTL', 300))
+
+# Seconds a worker reuses a JWT user's profile before reading it again
+app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+# Users each worker keeps cached at most; the least recently used go first
+app.config['IDENTITY_CACHE_MAX_ENTRIES'] = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', 4096))
+
 # JWT / session / cookies
 app.config['JWT_SECRET_KEY'] = os.environ.get("JWT_SECRET_KEY") or "fallback-secret-change-in-production"
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
@@ -52,6 +72,10 @@ metadata = MetaData(naming_convention={
 db = SQLAlchemy(metadata=metadata)
 migrate = Migrate(app, db)
 db.init_app(app)
+with app.app_context():
+    configure_engine(db.engine)
+    register_functions(db.engine)
+    request_metrics.init_app(app, db.engine)
 
 # Instantiate REST API
 api = Api(app)
@@ -64,6 +88,9 @@ app.config['UPLOAD_FOLDER'] = 'uploads/properties'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+# Content-addressed image files (see image_store.py)
+app.config['IMAGE_STORE_FOLDER'] = os.environ.get('IMAGE_STORE_FOLDER') or 'uploads/store'
+
 # Create upload directory
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -0,0 +1,152 @@
+"""
+SQLAlchemy engine pooling driven by environment variables.
+
+    DB_POOL_SIZE              persistent connections per worker (default 5;
+                              0 disables pooling, e.g. behind PgBouncer)
+    DB_MAX_OVERFLOW           extra connections allowed under burst (default 10)
+    DB_POOL_TIMEOUT           seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE           seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING          test connections on checkout (default true)
+    DB_POOL_LIFO              reuse the most recent connection first, letting
+                              idle extras time out server-side (default true)
+    DB_STATEMENT_TIMEOUT_MS   PostgreSQL statement_timeout (default unset)
+    DB_PGBOUNCER              transaction-pooling compatible mode: no server-side
+                              prepared statements, timeout set per transaction
+    DB_SQLITE_BUSY_TIMEOUT    seconds SQLite waits on a locked database (default 15)
+
+Pool checkout latency and saturation are tracked in ``pool_metrics``.
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return default if value in (None, '') else int(value)
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class PoolMetrics:
+    # Upper bounds (seconds) of the checkout wait histogram buckets
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.bucket_counts = [0] * len(self.BUCKETS)
+
+    def observe_checkout(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+
+    def snapshot(self):
+        pool = self.pool
+        with self._lock:
+            stats = {
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.timeouts,
+                'checkout_wait_seconds_total': round(self.wait_seconds_total, 6),
+                'checkout_wait_seconds_max': round(self.wait_seconds_max, 6),
+                'checkout_wait_buckets': dict(zip(self.BUCKETS, self.bucket_counts)),
+            }
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': max(pool.overflow(), 0),
+                'capacity': capacity,
+                'saturation': round(pool.checkedout() / capacity, 3) if capacity else None,
+            })
+        return stats
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_metrics.observe_checkout(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.observe_checkout(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``database_url`` from the environment."""
+    if database_url.startswith('sqlite'):
+        # SQLite waits on the database write lock rather than a row lock, so
+        # give concurrent booking transactions room to queue.
+        return {'connect_args': {'timeout': _env_int('DB_SQLITE_BUSY_TIMEOUT', 15)}}
+
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    }
+
+    pool_size = _env_int('DB_POOL_SIZE', 5)
+    if pool_size == 0:
+        options['poolclass'] = NullPool
+    else:
+        options.update({
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': pool_size,
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+            'pool_use_lifo': _env_bool('DB_POOL_LIFO', True),
+        })
+
+    connect_args = {}
+    statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    if _env_bool('DB_PGBOUNCER', False):
+        # Transaction pooling hands each transaction a different server
+        # connection, so server-side prepared statements cannot be reused.
+        connect_args['prepare_threshold'] = None
+    elif statement_timeout:
+        connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def configure_engine(engine):
+    """Attach pool metrics and PgBouncer session settings once the engine exists."""
+    pool_metrics.pool = engine.pool
+
+    statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    if engine.dialect.name == 'postgresql' and statement_timeout and _env_bool('DB_PGBOUNCER', False):
+        # PgBouncer rejects startup options and may hand every transaction a
+        # different server connection, so scope the timeout to each transaction
+        @event.listens_for(engine, 'begin')
+        def set_statement_timeout(connection):
+            connection.exec_driver_sql(f'SET LOCAL statement_timeout = {statement_timeout}')
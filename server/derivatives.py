@@ -0,0 +1,242 @@
+"""
+Resized and WebP copies of uploaded property images.
+
+After an upload commits, the new image ids are put on an in-process job
+queue. A background worker opens each original once and writes, next to
+it in the image store (see image_store.py):
+
+    <stem>.thumb.<jpg|png>  <stem>.thumb.webp    320px wide (listing cards)
+    <stem>.medium.<jpg|png> <stem>.medium.webp   960px wide (detail pages)
+    <stem>.full.webp                             original size
+
+Sizes wider than the original are skipped. Each file is recorded as an
+``ImageVariant`` row and the image's ``derivatives_status`` moves from
+``pending`` to ``ready`` (or ``failed``/``skipped``; animated GIFs are
+skipped). An image whose stored file already has variants reuses them
+without rendering.
+
+``uploaded_file`` picks a variant for ``?w=<pixels>`` with ``best_variant``:
+the smallest size at least that wide, as WebP when the client accepts it,
+falling back to the original. The choice is made from the file names, so
+serving an image never touches the database.
+
+Queued jobs live in memory; images left ``pending`` by a restart are picked
+up again with ``python derivatives.py`` (``--all`` regenerates everything).
+
+Configuration (environment):
+
+    IMAGE_DERIVATIVES           generate variants (default true; needs Pillow)
+    IMAGE_DERIVATIVE_WORKERS    worker threads (default 1)
+    IMAGE_JPEG_QUALITY          JPEG quality (default 82)
+    IMAGE_WEBP_QUALITY          WebP quality (default 80)
+"""
+
+import argparse
+import logging
+import os
+import queue
+import threading
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from config import app, db
+from image_store import image_store, is_stored, remove_files
+from models import PropertyImage, ImageVariant
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency; originals are served as uploaded
+    Image = None
+
+log = logging.getLogger('jambostays.images')
+
+# (name, width) from smallest to largest; 'full' keeps the original size
+SIZES = (('thumb', 320), ('medium', 960))
+VARIANT_NAMES = tuple(name for name, _ in SIZES) + ('full',)
+
+JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY') or 82)
+WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY') or 80)
+
+_EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'webp': 'webp'}
+
+
+def enabled():
+    setting = os.environ.get('IMAGE_DERIVATIVES', 'true').strip().lower()
+    return Image is not None and setting not in ('0', 'false', 'no', 'off')
+
+
+def variant_name(image_name, variant, fmt):
+    stem = image_name.rsplit('.', 1)[0]
+    return f'{stem}.{variant}.{_EXTENSIONS[fmt]}'
+
+
+def is_variant(filename):
+    parts = filename.rsplit('.', 2)
+    return len(parts) == 3 and parts[1] in VARIANT_NAMES
+
+
+def best_variant(folder, filename, width=None, webp=False):
+    """Name of the file to serve for ``filename`` at ``width`` pixels."""
+    if is_variant(filename):
+        return filename
+    candidates = [(name, fmt) for name, size in SIZES if width and size >= width
+                  for fmt in (('webp',) if webp else ()) + ('jpeg', 'png')]
+    if webp:
+        candidates.append(('full', 'webp'))
+    for variant, fmt in candidates:
+        name = variant_name(filename, variant, fmt)
+        if os.path.exists(os.path.join(folder, name)):
+            return name
+    return filename
+
+
+def _save(image, path, fmt):
+    # Written under a temporary name so a concurrent request never reads half a file
+    temp_path = f'{path}.tmp'
+    options = {'jpeg': {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True},
+               'png': {'optimize': True},
+               'webp': {'quality': WEBP_QUALITY, 'method': 4}}[fmt]
+    image.save(temp_path, format=fmt.upper(), **options)
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+def render_variants(folder, image_name):
+    """Write the variants of one original; returns ImageVariant field dicts, or None to skip."""
+    with Image.open(os.path.join(folder, image_name)) as original:
+        if getattr(original, 'n_frames', 1) > 1:
+            return None
+        image = ImageOps.exif_transpose(original)
+        alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if alpha else 'RGB')
+
+    raster = 'png' if alpha else 'jpeg'
+    rendered = [('full', 'webp', image)]
+    # Largest first, each resized from the previous one to keep the resampling cheap
+    source = image
+    for name, width in reversed(SIZES):
+        if width >= image.width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        source = source.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        rendered += [(name, raster, source), (name, 'webp', source)]
+
+    variants = []
+    for name, fmt, picture in rendered:
+        file_name = variant_name(image_name, name, fmt)
+        byte_size = _save(picture, os.path.join(folder, file_name), fmt)
+        variants.append({'name': name, 'format': fmt, 'width': picture.width,
+                         'height': picture.height, 'file_name': file_name, 'byte_size': byte_size})
+    return variants
+
+
+def _rendered_variants(image):
+    """Variants already rendered for another image of the same stored file."""
+    if not is_stored(image.image_name):
+        return None
+    sibling = PropertyImage.query.filter(
+        PropertyImage.content_hash == image.content_hash,
+        PropertyImage.image_name == image.image_name,
+        PropertyImage.derivatives_status == 'ready',
+        PropertyImage.id != image.id,
+    ).first()
+    if sibling is None:
+        return None
+    return [{'name': v.name, 'format': v.format, 'width': v.width, 'height': v.height,
+             'file_name': v.file_name, 'byte_size': v.byte_size} for v in sibling.variants]
+
+
+def generate(image_id):
+    """Render and record the variants of one image."""
+    image = db.session.get(PropertyImage, image_id)
+    if image is None or image.content_hash is None:
+        return
+    image_name = image.image_name
+    folder = image_store.image_folder(image.property_id, image_name)
+    try:
+        variants = _rendered_variants(image) or render_variants(folder, image_name)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        log.warning('Could not render variants of image %s', image_id, exc_info=True)
+        image.derivatives_status = 'failed'
+        db.session.commit()
+        return
+
+    ImageVariant.query.filter_by(image_id=image_id).delete()
+    for fields in variants or ():
+        db.session.add(ImageVariant(image_id=image_id, **fields))
+    image.derivatives_status = 'ready' if variants is not None else 'skipped'
+    try:
+        db.session.commit()
+    except (IntegrityError, StaleDataError):
+        db.session.rollback()
+
+    # The image may have been deleted while we were rendering
+    if db.session.query(PropertyImage.id).filter_by(id=image_id).first() is None:
+        ImageVariant.query.filter_by(image_id=image_id).delete()
+        db.session.commit()
+        # Stored files may be shared; the image store's sweep collects them
+        if not is_stored(image_name):
+            remove_files(folder, image_name)
+
+
+class DerivativeQueue:
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._jobs = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if not self._threads:
+                for n in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f'image-derivatives-{n}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def enqueue(self, image_ids):
+        if not enabled():
+            return
+        self._start()
+        for image_id in image_ids:
+            self._jobs.put(image_id)
+
+    def join(self):
+        """Block until every queued image has been processed."""
+        self._jobs.join()
+
+    def _run(self):
+        while True:
+            image_id = self._jobs.get()
+            try:
+                with app.app_context():
+                    generate(image_id)
+            except Exception:
+                log.exception('Image derivative job failed for image %s', image_id)
+            finally:
+                self._jobs.task_done()
+
+
+derivative_queue = DerivativeQueue(workers=int(os.environ.get('IMAGE_DERIVATIVE_WORKERS') or 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate image variants for uploaded property images.')
+    parser.add_argument('--all', action='store_true', help='regenerate variants of every uploaded image')
+    args = parser.parse_args(argv)
+    if Image is None:
+        raise SystemExit('Pillow is not installed')
+
+    with app.app_context():
+        query = PropertyImage.query.filter(PropertyImage.content_hash.isnot(None))
+        if not args.all:
+            query = query.filter(PropertyImage.derivatives_status == 'pending')
+        image_ids = [image_id for image_id, in query.with_entities(PropertyImage.id)]
+        for image_id in image_ids:
+            generate(image_id)
+    log.info('Generated variants for %d images', len(image_ids))
+
+
+if __name__ == '__main__':
+    main()
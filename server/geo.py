@@ -0,0 +1,154 @@
+"""
+Coordinates for property locations, without network calls.
+
+``geocode("Diani Beach, Kenya")`` looks the place up in a small built-in
+gazetteer: the seed locations, Kenyan cities and towns, and the main East
+African destinations. A location matches on the whole string or on its first
+comma-separated part, ignoring case and spacing, so "Nairobi" and
+"Nairobi, Kenya" both resolve. Unknown places give None and the property is
+simply left out of proximity searches until coordinates are set.
+
+Distances are great-circle kilometres on a spherical earth.
+``register_functions`` makes the same ``haversine_km`` available to SQL on
+SQLite connections; PostgreSQL uses earthdistance (see nearby.py).
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0
+
+# (place, region, latitude, longitude)
+PLACES = (
+    # Kenya
+    ('Nairobi', 'Kenya', -1.2864, 36.8172),
+    ('Mombasa', 'Kenya', -4.0435, 39.6682),
+    ('Kisumu', 'Kenya', -0.0917, 34.7680),
+    ('Nakuru', 'Kenya', -0.3031, 36.0800),
+    ('Eldoret', 'Kenya', 0.5143, 35.2698),
+    ('Thika', 'Kenya', -1.0333, 37.0693),
+    ('Malindi', 'Kenya', -3.2192, 40.1169),
+    ('Watamu', 'Kenya', -3.3540, 40.0240),
+    ('Kilifi', 'Kenya', -3.6305, 39.8499),
+    ('Mtwapa', 'Kenya', -3.9428, 39.7300),
+    ('Diani Beach', 'Kenya', -4.3167, 39.5833),
+    ('Ukunda', 'Kenya', -4.2875, 39.5661),
+    ('Kwale', 'Kenya', -4.1737, 39.4521),
+    ('Lamu', 'Kenya', -2.2717, 40.9020),
+    ('Voi', 'Kenya', -3.3961, 38.5561),
+    ('Naivasha', 'Kenya', -0.7167, 36.4333),
+    ('Nanyuki', 'Kenya', 0.0167, 37.0667),
+    ('Naro Moru', 'Kenya', -0.1667, 37.0167),
+    ('Nyeri', 'Kenya', -0.4201, 36.9476),
+    ('Karatina', 'Kenya', -0.4833, 37.1333),
+    ("Murang'a", 'Kenya', -0.7210, 37.1526),
+    ('Kerugoya', 'Kenya', -0.4986, 37.2803),
+    ('Embu', 'Kenya', -0.5310, 37.4506),
+    ('Chuka', 'Kenya', -0.3333, 37.6500),
+    ('Meru', 'Kenya', 0.0463, 37.6559),
+    ('Isiolo', 'Kenya', 0.3546, 37.5822),
+    ('Marsabit', 'Kenya', 2.3284, 37.9899),
+    ('Maralal', 'Kenya', 1.0968, 36.6982),
+    ('Nyahururu', 'Kenya', 0.0388, 36.3631),
+    ('Machakos', 'Kenya', -1.5177, 37.2634),
+    ('Athi River', 'Kenya', -1.4563, 36.9783),
+    ('Kitengela', 'Kenya', -1.4760, 36.9600),
+    ('Kajiado', 'Kenya', -1.8524, 36.7768),
+    ('Amboseli', 'Kenya', -2.6527, 37.2606),
+    ('Kiambu', 'Kenya', -1.1714, 36.8356),
+    ('Ruiru', 'Kenya', -1.1466, 36.9609),
+    ('Limuru', 'Kenya', -1.1136, 36.6424),
+    ('Narok', 'Kenya', -1.0833, 35.8667),
+    ('Maasai Mara', 'Kenya', -1.4900, 35.1439),
+    ('Kericho', 'Kenya', -0.3689, 35.2863),
+    ('Kisii', 'Kenya', -0.6817, 34.7667),
+    ('Homa Bay', 'Kenya', -0.5273, 34.4571),
+    ('Migori', 'Kenya', -1.0634, 34.4731),
+    ('Kakamega', 'Kenya', 0.2827, 34.7519),
+    ('Kapsabet', 'Kenya', 0.2037, 35.1050),
+    ('Bungoma', 'Kenya', 0.5635, 34.5606),
+    ('Busia', 'Kenya', 0.4608, 34.1115),
+    ('Kitale', 'Kenya', 1.0157, 35.0062),
+    ('Iten', 'Kenya', 0.6703, 35.5081),
+    ('Kabarnet', 'Kenya', 0.4919, 35.7430),
+    ('Lodwar', 'Kenya', 3.1191, 35.5973),
+    ('Garissa', 'Kenya', -0.4532, 39.6461),
+    ('Wajir', 'Kenya', 1.7471, 40.0573),
+    ('Mandera', 'Kenya', 3.9366, 41.8670),
+    # East Africa
+    ('Zanzibar', 'Tanzania', -6.1659, 39.2026),
+    ('Stone Town', 'Tanzania', -6.1622, 39.1921),
+    ('Dar es Salaam', 'Tanzania', -6.7924, 39.2083),
+    ('Arusha', 'Tanzania', -3.3869, 36.6830),
+    ('Moshi', 'Tanzania', -3.3349, 37.3404),
+    ('Kampala', 'Uganda', 0.3476, 32.5825),
+    ('Entebbe', 'Uganda', 0.0512, 32.4637),
+    ('Jinja', 'Uganda', 0.4244, 33.2042),
+    ('Kigali', 'Rwanda', -1.9441, 30.0619),
+    ('Addis Ababa', 'Ethiopia', 9.0054, 38.7636),
+    # Elsewhere in the sample data
+    ('Cape Town', 'South Africa', -33.9249, 18.4241),
+    ('Malibu', 'California', 34.0259, -118.7798),
+    ('Aspen', 'Colorado', 39.1911, -106.8175),
+    ('Manhattan', 'New York', 40.7831, -73.9712),
+    ('Tulum', 'Mexico', 20.2114, -87.4654),
+    ('Cotswolds', 'England', 51.8330, -1.8433),
+    ('Scottsdale', 'Arizona', 33.4942, -111.9261),
+)
+
+
+def _key(text):
+    return ' '.join(text.split()).lower()
+
+
+_GAZETTEER = {}
+for _place, _region, _lat, _lng in PLACES:
+    _GAZETTEER[_key(f'{_place}, {_region}')] = (_lat, _lng)
+    _GAZETTEER.setdefault(_key(_place), (_lat, _lng))
+
+
+def geocode(location):
+    """(latitude, longitude) of a location string, or None if it is not in the gazetteer."""
+    if not location:
+        return None
+    key = _key(location)
+    return _GAZETTEER.get(key) or _GAZETTEER.get(key.split(',', 1)[0].strip())
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    ``(south, north, [(west, east), ...])`` enclosing every point within
+    ``radius_km``; split in two where it crosses the antimeridian.
+    """
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(-90.0, lat - delta_lat), min(90.0, lat + delta_lat)
+    if south <= -90.0 or north >= 90.0:
+        return south, north, [(-180.0, 180.0)]
+    # Widest at the latitude where the circle touches its east and west edges
+    delta_lng = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM)
+                                               / math.cos(math.radians(lat)))))
+    west, east = lng - delta_lng, lng + delta_lng
+    if west < -180.0:
+        return south, north, [(west + 360.0, 180.0), (-180.0, east)]
+    if east > 180.0:
+        return south, north, [(west, 180.0), (-180.0, east - 360.0)]
+    return south, north, [(west, east)]
+
+
+def register_functions(engine):
+    """Expose ``haversine_km`` to SQL on SQLite connections."""
+    if engine.dialect.name != 'sqlite':
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'connect')
+    def add_functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function('haversine_km', 4, haversine_km, deterministic=True)
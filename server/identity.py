@@ -0,0 +1,176 @@
+"""
+Resolve the user behind a JWT once per request.
+
+``login`` and ``register`` issue access tokens carrying the user's profile
+(email, name, user_type, created_at) as claims, stamped with the user's
+``profile_version``. ``current_identity()`` builds the user from those
+claims without touching the database. Only when the worker knows of a
+newer profile version than the token's, or the token predates claims, is
+the user read from the database.
+
+Database reads go through a small per-worker LRU cache of read-only
+``Identity`` snapshots (at most ``IDENTITY_CACHE_MAX_ENTRIES`` users) that
+lives for ``IDENTITY_CACHE_TTL`` seconds, and
+the result is kept in the request environ (``g`` lives on the app context,
+which callers holding their own context share across requests), so a
+request costs at most one primary-key read.
+
+Handlers that modify the user load the row, bump ``profile_version`` and
+call ``identities.refresh(user)`` after committing. Workers that did not
+handle the update keep trusting older tokens until they next read the
+user or the token expires; ``update_profile`` hands the client a fresh
+token.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from functools import wraps
+
+from flask import request
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+
+from config import app, db
+from models import User
+
+Identity = namedtuple('Identity', ('id', 'email', 'name', 'user_type', 'created_at', 'profile_version'))
+
+_ENVIRON_KEY = 'jambostays.identity'
+_UNRESOLVED = object()
+
+
+def _snapshot(user):
+    return Identity(user.id, user.email, user.name, user.user_type, user.created_at,
+                    user.profile_version)
+
+
+class IdentityCache:
+    def __init__(self, ttl=None, max_entries=None):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._users = OrderedDict()
+        # Latest profile_version seen per user; kept past the TTL so a token
+        # issued before an update is still recognised as stale
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return app.config['IDENTITY_CACHE_TTL']
+
+    @property
+    def max_entries(self):
+        if self._max_entries is not None:
+            return self._max_entries
+        return app.config['IDENTITY_CACHE_MAX_ENTRIES']
+
+    def _store(self, identity):
+        with self._lock:
+            self._users[identity.id] = (time.monotonic(), identity)
+            self._users.move_to_end(identity.id)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+            self._versions[identity.id] = max(self._versions.get(identity.id, 0),
+                                              identity.profile_version)
+
+    def get(self, user_id):
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is not None:
+                if time.monotonic() - cached[0] < self.ttl:
+                    self._users.move_to_end(user_id)
+                    return cached[1]
+                del self._users[user_id]
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = _snapshot(user)
+        self._store(identity)
+        return identity
+
+    def is_stale(self, user_id, profile_version):
+        with self._lock:
+            return profile_version < self._versions.get(user_id, 0)
+
+    def refresh(self, user):
+        """Record a user just committed by this worker."""
+        self._store(_snapshot(user))
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+                self._versions.clear()
+            else:
+                self._users.pop(user_id, None)
+
+
+identities = IdentityCache()
+
+
+def profile_claims(user):
+    """Additional access token claims for ``user``."""
+    return {
+        'pv': user.profile_version,
+        'email': user.email,
+        'name': user.name,
+        'user_type': user.user_type,
+        'created_at': user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+def _from_claims(user_id, claims):
+    created_at = claims['created_at']
+    return Identity(user_id, claims['email'], claims['name'], claims['user_type'],
+                    datetime.fromisoformat(created_at) if created_at else None, claims['pv'])
+
+
+def current_user_id():
+    """The JWT identity as an int, or None if it is not a user id."""
+    try:
+        return int(get_jwt_identity())
+    except (TypeError, ValueError):
+        return None
+
+
+def _resolve():
+    user_id = current_user_id()
+    if user_id is None:
+        return None
+    claims = get_jwt()
+    if 'pv' in claims and not identities.is_stale(user_id, claims['pv']):
+        return _from_claims(user_id, claims)
+    return identities.get(user_id)
+
+
+def current_identity():
+    """``Identity`` of the user making this request, or None if they no longer exist."""
+    identity = request.environ.get(_ENVIRON_KEY, _UNRESOLVED)
+    if identity is _UNRESOLVED:
+        identity = _resolve()
+        request.environ[_ENVIRON_KEY] = identity
+    return identity
+
+
+def claims_required(user_type=None, error='Access denied'):
+    """
+    ``jwt_required()`` plus an authorization check on the token's claims.
+    Responds 401 if the user no longer exists and 403 if ``user_type`` does
+    not match.
+    """
+    def decorator(view):
+        @wraps(view)
+        @jwt_required()
+        def wrapper(*args, **kwargs):
+            identity = current_identity()
+            if identity is None:
+                return {"error": "User not found"}, 401
+            if user_type is not None and identity.user_type != user_type:
+                return {"error": error}, 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
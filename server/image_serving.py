@@ -0,0 +1,103 @@
+"""
+Serving uploaded image files.
+
+Stored images never change under their name: content-addressed files
+(``<sha256>.<ext>``, see image_store.py), their resized variants and the
+older ``<uuid4>_<name>`` uploads. They are sent with a year-long
+``Cache-Control: public, immutable`` and the file name as a strong ETag,
+so a revalidation (``If-None-Match``) is answered 304 without touching the
+disk. A negotiated ``?w=`` request that falls back to the original while
+its variants are still being rendered is cached briefly instead, so clients
+pick the variant up later. ``Range`` and ``If-Range`` requests are handled
+by werkzeug.
+
+The transfer itself can be handed off so image traffic does not hold an
+API worker for the length of a download:
+
+    IMAGE_SENDFILE=x-accel-redirect   nginx; the response carries
+                                      X-Accel-Redirect: <prefix>/<path> and
+                                      no body, e.g. with
+                                          location /_uploads/ {
+                                              internal;
+                                              alias /srv/jambostays/server/uploads/;
+                                          }
+    IMAGE_SENDFILE=x-sendfile         Apache mod_xsendfile / lighttpd
+    (unset)                           the app sends the file; under gunicorn
+                                      the body goes through wsgi.file_wrapper,
+                                      which uses os.sendfile
+
+Configuration (environment):
+
+    IMAGE_SENDFILE          offload mode, as above
+    IMAGE_ACCEL_ROOT        directory the X-Accel-Redirect location maps
+                            (default uploads)
+    IMAGE_ACCEL_PREFIX      internal nginx location (default /_uploads)
+    IMAGE_MAX_AGE           seconds to cache files that may still change
+                            (default 300)
+"""
+
+import mimetypes
+import os
+import re
+
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+from image_store import is_stored
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = int(os.environ.get('IMAGE_MAX_AGE') or 300)
+
+SENDFILE = os.environ.get('IMAGE_SENDFILE', '').strip().lower()
+ACCEL_ROOT = os.path.abspath(os.environ.get('IMAGE_ACCEL_ROOT') or 'uploads')
+ACCEL_PREFIX = (os.environ.get('IMAGE_ACCEL_PREFIX') or '/_uploads').rstrip('/')
+
+_UUID_NAME = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_')
+
+
+def is_immutable(filename):
+    """Names whose content is fixed for good: content hashes and uuid uploads."""
+    return is_stored(filename) or bool(_UUID_NAME.match(filename))
+
+
+def _cache(response, immutable):
+    response.cache_control.public = True
+    response.cache_control.no_cache = None
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE if immutable else MUTABLE_MAX_AGE
+    response.cache_control.immutable = immutable
+    response.vary.add('Accept')
+    return response
+
+
+def send_image(folder, filename, served, negotiated=False):
+    """Send ``served`` from ``folder`` in answer to a request for ``filename``.
+
+    ``negotiated`` is true when the client asked for a variant (a width or
+    WebP); if ``served`` is still the original, the answer may change once
+    variants exist.
+    """
+    immutable = is_immutable(served) and not (negotiated and served == filename)
+
+    if is_immutable(served) and request.if_none_match.contains(served):
+        response = Response(status=304)
+        response.set_etag(served)
+        return _cache(response, immutable)
+
+    path = safe_join(os.path.abspath(folder), served)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    if SENDFILE in ('x-accel-redirect', 'x-sendfile'):
+        response = Response(mimetype=mimetypes.guess_type(served)[0] or 'application/octet-stream')
+        if SENDFILE == 'x-accel-redirect':
+            response.headers['X-Accel-Redirect'] = f'{ACCEL_PREFIX}/{os.path.relpath(path, ACCEL_ROOT)}'
+        else:
+            response.headers['X-Sendfile'] = path
+        if is_immutable(served):
+            response.set_etag(served)
+        return _cache(response, immutable)
+
+    response = send_file(path, conditional=True,
+                         etag=served if is_immutable(served) else True,
+                         max_age=IMMUTABLE_MAX_AGE if immutable else MUTABLE_MAX_AGE)
+    return _cache(response, immutable)
@@ -0,0 +1,191 @@
+"""
+Content-addressed storage for uploaded property images.
+
+Each distinct file is stored once, named by its sha256:
+
+    <IMAGE_STORE_FOLDER>/<hash[:2]>/<hash>.<ext>
+
+with the resized copies from ``derivatives.py`` alongside. ``image_blobs``
+holds one row per stored file and the number of ``PropertyImage`` rows
+using it. Uploading a photo that is already stored, again or for another
+listing, only increments that count and the streamed temporary copy is
+dropped; deleting an image only decrements it. Images uploaded before the
+store existed keep their per-property ``uuid_name`` files.
+
+Unreferenced files are removed by a periodic sweep, e.g. hourly from cron:
+
+    python image_store.py
+
+It deletes blobs released more than ``IMAGE_GC_GRACE`` seconds ago, adopts
+stored files that have no row (left by rolled-back uploads) so the next
+sweep can collect them, and removes stale temporary files. An upload bumps
+the count before it checks the file is in place, and the sweep deletes the
+row before the files and commits afterwards, so the row lock keeps a sweep
+from removing a blob that an upload is re-acquiring.
+
+Configuration (environment):
+
+    IMAGE_STORE_FOLDER  root of the store (default uploads/store)
+    IMAGE_GC_GRACE      seconds a released blob is kept (default 3600)
+"""
+
+import glob
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, select, update
+
+from config import app, db
+from models import ImageBlob
+
+log = logging.getLogger('jambostays.images')
+
+GC_GRACE = int(os.environ.get('IMAGE_GC_GRACE') or 3600)
+
+_STORED_NAME = re.compile(r'^[0-9a-f]{64}\.')
+_EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+
+def is_stored(file_name):
+    """True for content-addressed names (and their variants)."""
+    return bool(_STORED_NAME.match(file_name))
+
+
+def remove_files(folder, file_name):
+    """Delete a file and every variant of it (``<stem>.*``)."""
+    stem = file_name.rsplit('.', 1)[0]
+    for path in [os.path.join(folder, file_name)] + glob.glob(os.path.join(glob.escape(folder), glob.escape(stem) + '.*')):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _insert():
+    # INSERT ... ON CONFLICT, as spelled by the backend (PostgreSQL or SQLite)
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(ImageBlob)
+
+
+class ImageStore:
+    @property
+    def root(self):
+        return app.config['IMAGE_STORE_FOLDER']
+
+    def incoming_folder(self):
+        """Where uploads are streamed before they are stored (same filesystem)."""
+        folder = os.path.join(self.root, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def folder(self, content_hash):
+        return os.path.join(self.root, content_hash[:2])
+
+    def image_folder(self, property_id, file_name):
+        """Folder holding ``file_name`` (an original or a variant) of a property image."""
+        if is_stored(file_name):
+            return self.folder(file_name)
+        return os.path.join(app.config['UPLOAD_FOLDER'], str(property_id))
+
+    def add(self, upload, extension):
+        """Store a finished ``StreamedUpload`` and take a reference; returns the file name."""
+        content_hash = upload.sha256
+        extension = _EXTENSION_ALIASES.get(extension.lower(), extension.lower())
+        file_name = self._acquire(content_hash, f'{content_hash}.{extension}', upload.size)
+
+        folder = self.folder(content_hash)
+        path = os.path.join(folder, file_name)
+        if os.path.exists(path):
+            # Already stored: no second copy
+            upload.discard()
+        else:
+            os.makedirs(folder, exist_ok=True)
+            upload.store(path)
+        return file_name
+
+    def _acquire(self, content_hash, file_name, byte_size):
+        values = {'content_hash': content_hash, 'file_name': file_name, 'byte_size': byte_size,
+                  'ref_count': 1, 'created_at': datetime.utcnow(), 'released_at': None}
+        # An existing blob keeps its name, even if this upload used another extension
+        statement = _insert().values(**values).on_conflict_do_update(
+            index_elements=['content_hash'],
+            set_={'ref_count': ImageBlob.ref_count + 1, 'released_at': None},
+        ).returning(ImageBlob.file_name)
+        return db.session.execute(statement).scalar_one()
+
+    def release(self, image):
+        """Drop ``image``'s reference to its file; the sweep removes unreferenced files."""
+        if not is_stored(image.image_name):
+            remove_files(self.image_folder(image.property_id, image.image_name), image.image_name)
+            return
+        # SET expressions see the row before the update: stamp only the last release
+        db.session.execute(
+            update(ImageBlob).where(ImageBlob.content_hash == image.content_hash)
+            .values(ref_count=ImageBlob.ref_count - 1,
+                    released_at=case((ImageBlob.ref_count <= 1, datetime.utcnow()),
+                                     else_=ImageBlob.released_at))
+        )
+
+    def collect_garbage(self, grace=GC_GRACE):
+        """Remove unreferenced files; returns the number of blobs deleted."""
+        cutoff = datetime.utcnow() - timedelta(seconds=grace)
+        released = (ImageBlob.ref_count <= 0) & (ImageBlob.released_at < cutoff)
+        removed = 0
+        for content_hash, file_name in db.session.execute(
+                select(ImageBlob.content_hash, ImageBlob.file_name).where(released)).all():
+            # Re-checked under the row lock: an upload may have taken a new reference
+            deleted = db.session.execute(
+                delete(ImageBlob).where(ImageBlob.content_hash == content_hash, released))
+            if deleted.rowcount:
+                remove_files(self.folder(content_hash), file_name)
+                removed += 1
+            db.session.commit()
+
+        self._adopt_orphans(cutoff)
+        self._remove_stale_temporaries(cutoff.timestamp())
+        return removed
+
+    def _adopt_orphans(self, cutoff):
+        # Files whose upload rolled back: give them a released row so the
+        # ordinary, lock-protected path deletes them on a later sweep
+        if not os.path.isdir(self.root):
+            return
+        for shard in sorted(os.listdir(self.root)):
+            if len(shard) != 2:
+                continue
+            names = {name for name in os.listdir(os.path.join(self.root, shard))
+                     if is_stored(name) and name.count('.') == 1}
+            if not names:
+                continue
+            known = set(db.session.execute(
+                select(ImageBlob.content_hash).where(ImageBlob.content_hash.startswith(shard))).scalars())
+            for name in names:
+                content_hash = name.split('.', 1)[0]
+                path = os.path.join(self.root, shard, name)
+                if content_hash in known or os.path.getmtime(path) >= cutoff.timestamp():
+                    continue
+                values = {'content_hash': content_hash, 'file_name': name, 'byte_size': os.path.getsize(path),
+                          'ref_count': 0, 'created_at': datetime.utcnow(), 'released_at': datetime.utcnow()}
+                db.session.execute(_insert().values(**values).on_conflict_do_nothing())
+                log.info('Adopted unreferenced image file %s', name)
+            db.session.commit()
+
+    def _remove_stale_temporaries(self, cutoff):
+        patterns = [os.path.join(self.root, 'tmp', '.upload-*'), os.path.join(self.root, '??', '*.tmp')]
+        for path in (path for pattern in patterns for path in glob.glob(pattern)):
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+
+image_store = ImageStore()
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        began = time.perf_counter()
+        count = image_store.collect_garbage()
+        log.info('Removed %d unreferenced images in %.1fs', count, time.perf_counter() - began)
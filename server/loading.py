@@ -0,0 +1,38 @@
+"""
+Named eager-loading profiles for the read endpoints.
+
+Every relationship on the models is ``lazy=True``, so serializing a list of
+properties fires one SELECT per relationship per row. A profile names the
+relationships an endpoint serializes and loads them up front with
+``selectinload``/``joinedload``, making the statement count independent of
+the number of rows. When a client narrows the payload with ``?fields=``,
+only the relationships it asked for are loaded.
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import Property, Booking
+
+PROPERTY_LOADERS = {
+    'images': selectinload(Property.images),
+    'owner': joinedload(Property.owner),
+    'bookings': selectinload(Property.bookings),
+}
+
+BOOKING_LOADERS = {
+    'property': selectinload(Booking.property).selectinload(Property.images),
+}
+
+# profile -> (loaders for the queried model, relationships loaded by default)
+PROFILES = {
+    'listing': (PROPERTY_LOADERS, ('images',)),
+    'detail': (PROPERTY_LOADERS, ('images', 'owner')),
+    'owner_dashboard': (PROPERTY_LOADERS, ('images', 'bookings')),
+    'booking_list': (BOOKING_LOADERS, ()),
+}
+
+
+def load_profile(query, profile, fields=None):
+    loaders, default = PROFILES[profile]
+    names = default if fields is None else [name for name in fields if name in loaders]
+    return query.options(*(loaders[name] for name in names))
@@ -0,0 +1,218 @@
+"""
+Per-request performance metrics, served in Prometheus text format.
+
+For every request the middleware records, labelled by method and URL rule
+(``/api/properties/<int:id>``, never the raw path):
+
+    jambostays_http_requests_total              by status code
+    jambostays_http_request_duration_seconds    latency histogram
+    jambostays_http_request_sql_queries         statements per request histogram
+    jambostays_http_request_sql_seconds_total   time spent in the database
+    jambostays_http_response_bytes_total        response body size
+
+SQL statements are counted with ``before/after_cursor_execute`` hooks on
+the engine. Connection pool statistics from ``db_pool.pool_metrics`` are
+exported alongside.
+
+Configuration (environment):
+
+    METRICS_ENABLED           record request metrics (default true)
+    METRICS_SLOW_REQUEST_MS   log requests slower than this, with their
+                              slowest statements (default 0, off)
+
+Metrics are per worker process; scrape each worker, or aggregate them in
+the collector.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from flask import request
+from sqlalchemy import event
+
+from db_pool import pool_metrics
+
+log = logging.getLogger('jambostays.metrics')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Statements kept per request for the slow-request log
+SLOW_LOG_STATEMENTS = 10
+
+_current = ContextVar('jambostays_request_stats', default=None)
+
+
+class _RequestStats:
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'statements', 'pending')
+
+    def __init__(self, keep_statements):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = [] if keep_statements else None
+        self.pending = []
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def _histogram_lines(name, histogram, labels):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+    yield f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}'
+    yield f'{name}_sum{{{labels}}} {histogram.sum}'
+    yield f'{name}_count{{{labels}}} {histogram.count}'
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.slow_request_seconds = 0
+        self.requests = defaultdict(int)  # (method, route, status) -> count
+        self.latency = {}  # (method, route) -> _Histogram
+        self.queries = {}
+        self.sql_seconds = defaultdict(float)
+        self.response_bytes = defaultdict(int)
+
+    def init_app(self, app, engine):
+        if os.environ.get('METRICS_ENABLED', 'true').strip().lower() in ('0', 'false', 'no', 'off'):
+            return
+        self.slow_request_seconds = int(os.environ.get('METRICS_SLOW_REQUEST_MS') or 0) / 1000
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_statement(conn, cursor, statement, parameters, context, executemany):
+            stats = _current.get()
+            if stats is not None:
+                stats.pending.append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def end_statement(conn, cursor, statement, parameters, context, executemany):
+            stats = _current.get()
+            if stats is not None and stats.pending:
+                elapsed = time.perf_counter() - stats.pending.pop()
+                stats.sql_count += 1
+                stats.sql_seconds += elapsed
+                if stats.statements is not None:
+                    stats.statements.append((elapsed, statement))
+
+        @app.before_request
+        def start_request():
+            _current.set(_RequestStats(keep_statements=bool(self.slow_request_seconds)))
+
+        @app.after_request
+        def record_request(response):
+            stats = _current.get()
+            if stats is not None:
+                _current.set(None)
+                self.observe(stats, response)
+            return response
+
+    def observe(self, stats, response):
+        duration = time.perf_counter() - stats.started
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        key = (request.method, route)
+        with self._lock:
+            self.requests[key + (response.status_code,)] += 1
+            self.latency.setdefault(key, _Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.queries.setdefault(key, _Histogram(QUERY_BUCKETS)).observe(stats.sql_count)
+            self.sql_seconds[key] += stats.sql_seconds
+            self.response_bytes[key] += response.content_length or 0
+
+        if self.slow_request_seconds and duration >= self.slow_request_seconds:
+            slowest = sorted(stats.statements, key=lambda item: item[0], reverse=True)[:SLOW_LOG_STATEMENTS]
+            log.warning('Slow request %s %s', request.method, request.path, extra={
+                'route': route,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 1),
+                'sql_count': stats.sql_count,
+                'sql_ms': round(stats.sql_seconds * 1000, 1),
+                'slowest_statements': [
+                    {'ms': round(elapsed * 1000, 2), 'sql': ' '.join(statement.split())[:300]}
+                    for elapsed, statement in slowest
+                ],
+            })
+
+    def render(self):
+        """All metrics in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines += ['# HELP jambostays_http_requests_total HTTP requests by route and status.',
+                      '# TYPE jambostays_http_requests_total counter']
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'jambostays_http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}')
+
+            lines += ['# HELP jambostays_http_request_duration_seconds Request latency.',
+                      '# TYPE jambostays_http_request_duration_seconds histogram']
+            for (method, route), histogram in sorted(self.latency.items()):
+                lines += _histogram_lines('jambostays_http_request_duration_seconds', histogram,
+                                          _labels(method=method, route=route))
+
+            lines += ['# HELP jambostays_http_request_sql_queries SQL statements issued per request.',
+                      '# TYPE jambostays_http_request_sql_queries histogram']
+            for (method, route), histogram in sorted(self.queries.items()):
+                lines += _histogram_lines('jambostays_http_request_sql_queries', histogram,
+                                          _labels(method=method, route=route))
+
+            lines += ['# HELP jambostays_http_request_sql_seconds_total Time spent executing SQL.',
+                      '# TYPE jambostays_http_request_sql_seconds_total counter']
+            for (method, route), seconds in sorted(self.sql_seconds.items()):
+                lines.append(f'jambostays_http_request_sql_seconds_total{{{_labels(method=method, route=route)}}} {seconds:.6f}')
+
+            lines += ['# HELP jambostays_http_response_bytes_total Response body bytes.',
+                      '# TYPE jambostays_http_response_bytes_total counter']
+            for (method, route), size in sorted(self.response_bytes.items()):
+                lines.append(f'jambostays_http_response_bytes_total{{{_labels(method=method, route=route)}}} {size}')
+
+        lines += self._pool_lines()
+        return '\n'.join(lines) + '\n'
+
+    def _pool_lines(self):
+        pool = pool_metrics.snapshot()
+        lines = ['# HELP jambostays_db_pool_checkouts_total Connections checked out of the pool.',
+                 '# TYPE jambostays_db_pool_checkouts_total counter',
+                 f"jambostays_db_pool_checkouts_total {pool['checkouts']}",
+                 '# HELP jambostays_db_pool_checkout_timeouts_total Checkouts that timed out.',
+                 '# TYPE jambostays_db_pool_checkout_timeouts_total counter',
+                 f"jambostays_db_pool_checkout_timeouts_total {pool['checkout_timeouts']}",
+                 '# HELP jambostays_db_pool_checkout_wait_seconds Time waited for a connection.',
+                 '# TYPE jambostays_db_pool_checkout_wait_seconds histogram']
+        cumulative = 0
+        for bound, count in pool['checkout_wait_buckets'].items():
+            cumulative += count
+            lines.append(f'jambostays_db_pool_checkout_wait_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"jambostays_db_pool_checkout_wait_seconds_bucket{{le=\"+Inf\"}} {pool['checkouts']}",
+                  f"jambostays_db_pool_checkout_wait_seconds_sum {pool['checkout_wait_seconds_total']}",
+                  f"jambostays_db_pool_checkout_wait_seconds_count {pool['checkouts']}"]
+        for name in ('size', 'checked_out', 'overflow', 'capacity'):
+            if name in pool:
+                lines += [f'# TYPE jambostays_db_pool_{name} gauge', f'jambostays_db_pool_{name} {pool[name]}']
+        return lines
+
+
+request_metrics = RequestMetrics()
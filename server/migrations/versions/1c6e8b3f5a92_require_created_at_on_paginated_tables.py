@@ -0,0 +1,52 @@
+"""Backfill created_at and make it NOT NULL on owners, properties and bookings
+
+Revision ID: 1c6e8b3f5a92
+Revises: 5f1a9e3c7d28
+Create Date: 2026-10-18 09:14:52.603118
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c6e8b3f5a92'
+down_revision = '5f1a9e3c7d28'
+branch_labels = None
+depends_on = None
+
+# Keyset cursors page on (created_at, id); a NULL created_at compares false
+# both ways and would end a listing early
+TABLES = ('owners', 'properties', 'bookings')
+
+
+def _set_nullable(table_name, nullable):
+    bind = op.get_bind()
+    # The SQLite table rebuild drops the table's triggers (search and
+    # proximity index on properties); put them back afterwards
+    triggers = []
+    if bind.dialect.name == 'sqlite':
+        triggers = [sql for sql, in bind.execute(
+            sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"),
+            {'table': table_name})]
+
+    with op.batch_alter_table(table_name, schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=nullable)
+
+    for sql in triggers:
+        op.execute(sql)
+
+
+def upgrade():
+    backfilled_at = datetime.utcnow()
+    for table_name in TABLES:
+        table = sa.table(table_name, sa.column('created_at', sa.DateTime()))
+        op.execute(table.update().where(table.c.created_at.is_(None)).values(created_at=backfilled_at))
+        _set_nullable(table_name, False)
+
+
+def downgrade():
+    for table_name in reversed(TABLES):
+        _set_nullable(table_name, True)
@@ -0,0 +1,40 @@
+"""Add denormalized featured_image_url to properties
+
+Revision ID: 3c7a91d0f6e2
+Revises: 9d4f2a61c3b8
+Create Date: 2026-10-17 13:41:09.302117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7a91d0f6e2'
+down_revision = '9d4f2a61c3b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('featured_image_url', sa.String(length=255), nullable=True))
+
+    # Backfill: featured image first, otherwise the first image by upload order.
+    # property_images is created by db.create_all() rather than a migration,
+    # so it may not exist yet.
+    if not sa.inspect(op.get_bind()).has_table('property_images'):
+        return
+    op.execute("""
+        UPDATE properties SET featured_image_url = (
+            SELECT pi.image_url FROM property_images pi
+            WHERE pi.property_id = properties.id
+            ORDER BY pi.is_featured DESC, COALESCE(pi.upload_order, 0), pi.id
+            LIMIT 1
+        )
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_column('featured_image_url')
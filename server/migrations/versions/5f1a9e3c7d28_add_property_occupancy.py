@@ -0,0 +1,57 @@
+"""Add property_occupancy calendar, backfilled from confirmed bookings
+
+Revision ID: 5f1a9e3c7d28
+Revises: 8e4d1c7b2f56
+Create Date: 2026-10-18 00:21:37.164820
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f1a9e3c7d28'
+down_revision = '8e4d1c7b2f56'
+branch_labels = None
+depends_on = None
+
+CHUNK = 10000
+
+
+def _month_masks(check_in, check_out):
+    # Same layout as occupancy.month_masks: bit day-1 of each month
+    day = check_in
+    while day < check_out:
+        month = day.replace(day=1)
+        end = min(check_out, (month + timedelta(days=32)).replace(day=1))
+        yield month, ((1 << (end - day).days) - 1) << (day.day - 1)
+        day = end
+
+
+def upgrade():
+    occupancy = op.create_table('property_occupancy',
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('nights', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['property_id'], ['properties.id'], name=op.f('fk_property_occupancy_property_id_properties')),
+    sa.PrimaryKeyConstraint('property_id', 'month')
+    )
+
+    bookings = sa.table('bookings', sa.column('property_id', sa.Integer()), sa.column('booking_status', sa.String()),
+                        sa.column('check_in_date', sa.Date()), sa.column('check_out_date', sa.Date()))
+    months = {}
+    for property_id, check_in, check_out in op.get_bind().execute(
+            sa.select(bookings.c.property_id, bookings.c.check_in_date, bookings.c.check_out_date)
+            .where(bookings.c.booking_status == 'confirmed')):
+        for month, mask in _month_masks(check_in, check_out):
+            months[(property_id, month)] = months.get((property_id, month), 0) | mask
+    rows = [{'property_id': property_id, 'month': month, 'nights': nights}
+            for (property_id, month), nights in sorted(months.items())]
+    for i in range(0, len(rows), CHUNK):
+        op.bulk_insert(occupancy, rows[i:i + CHUNK])
+
+
+def downgrade():
+    op.drop_table('property_occupancy')
@@ -0,0 +1,26 @@
+"""Add profile_version to users
+
+Revision ID: 7f2d4b8e1a63
+Revises: e81b5f3a2c97
+Create Date: 2026-10-17 17:02:11.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f2d4b8e1a63'
+down_revision = 'e81b5f3a2c97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('profile_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('profile_version')
@@ -0,0 +1,177 @@
+"""Add latitude/longitude to properties with a spatial index
+
+Revision ID: 8e4d1c7b2f56
+Revises: c52e9b17f4d8
+Create Date: 2026-10-17 23:48:05.731942
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4d1c7b2f56'
+down_revision = 'c52e9b17f4d8'
+branch_labels = None
+depends_on = None
+
+PG_UPGRADE = (
+    "CREATE EXTENSION IF NOT EXISTS cube",
+    "CREATE EXTENSION IF NOT EXISTS earthdistance",
+    "CREATE INDEX IF NOT EXISTS ix_properties_earth ON properties USING gist (ll_to_earth(latitude, longitude))",
+)
+
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE properties_geo USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+    """CREATE TRIGGER properties_geo_insert AFTER INSERT ON properties
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO properties_geo VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END""",
+    """CREATE TRIGGER properties_geo_delete AFTER DELETE ON properties BEGIN
+        DELETE FROM properties_geo WHERE id = old.id;
+    END""",
+    """CREATE TRIGGER properties_geo_update AFTER UPDATE OF latitude, longitude ON properties BEGIN
+        DELETE FROM properties_geo WHERE id = old.id;
+        INSERT INTO properties_geo SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+    """INSERT INTO properties_geo SELECT id, latitude, latitude, longitude, longitude FROM properties
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL""",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS properties_geo_update",
+    "DROP TRIGGER IF EXISTS properties_geo_delete",
+    "DROP TRIGGER IF EXISTS properties_geo_insert",
+    "DROP TABLE IF EXISTS properties_geo",
+)
+
+
+# A snapshot of the gazetteer in geo.py, so the backfill stays the same
+# (and makes no network calls) whatever later becomes of that module
+PLACES = (
+    # Kenya
+    ('Nairobi', 'Kenya', -1.2864, 36.8172),
+    ('Mombasa', 'Kenya', -4.0435, 39.6682),
+    ('Kisumu', 'Kenya', -0.0917, 34.7680),
+    ('Nakuru', 'Kenya', -0.3031, 36.0800),
+    ('Eldoret', 'Kenya', 0.5143, 35.2698),
+    ('Thika', 'Kenya', -1.0333, 37.0693),
+    ('Malindi', 'Kenya', -3.2192, 40.1169),
+    ('Watamu', 'Kenya', -3.3540, 40.0240),
+    ('Kilifi', 'Kenya', -3.6305, 39.8499),
+    ('Mtwapa', 'Kenya', -3.9428, 39.7300),
+    ('Diani Beach', 'Kenya', -4.3167, 39.5833),
+    ('Ukunda', 'Kenya', -4.2875, 39.5661),
+    ('Kwale', 'Kenya', -4.1737, 39.4521),
+    ('Lamu', 'Kenya', -2.2717, 40.9020),
+    ('Voi', 'Kenya', -3.3961, 38.5561),
+    ('Naivasha', 'Kenya', -0.7167, 36.4333),
+    ('Nanyuki', 'Kenya', 0.0167, 37.0667),
+    ('Naro Moru', 'Kenya', -0.1667, 37.0167),
+    ('Nyeri', 'Kenya', -0.4201, 36.9476),
+    ('Karatina', 'Kenya', -0.4833, 37.1333),
+    ("Murang'a", 'Kenya', -0.7210, 37.1526),
+    ('Kerugoya', 'Kenya', -0.4986, 37.2803),
+    ('Embu', 'Kenya', -0.5310, 37.4506),
+    ('Chuka', 'Kenya', -0.3333, 37.6500),
+    ('Meru', 'Kenya', 0.0463, 37.6559),
+    ('Isiolo', 'Kenya', 0.3546, 37.5822),
+    ('Marsabit', 'Kenya', 2.3284, 37.9899),
+    ('Maralal', 'Kenya', 1.0968, 36.6982),
+    ('Nyahururu', 'Kenya', 0.0388, 36.3631),
+    ('Machakos', 'Kenya', -1.5177, 37.2634),
+    ('Athi River', 'Kenya', -1.4563, 36.9783),
+    ('Kitengela', 'Kenya', -1.4760, 36.9600),
+    ('Kajiado', 'Kenya', -1.8524, 36.7768),
+    ('Amboseli', 'Kenya', -2.6527, 37.2606),
+    ('Kiambu', 'Kenya', -1.1714, 36.8356),
+    ('Ruiru', 'Kenya', -1.1466, 36.9609),
+    ('Limuru', 'Kenya', -1.1136, 36.6424),
+    ('Narok', 'Kenya', -1.0833, 35.8667),
+    ('Maasai Mara', 'Kenya', -1.4900, 35.1439),
+    ('Kericho', 'Kenya', -0.3689, 35.2863),
+    ('Kisii', 'Kenya', -0.6817, 34.7667),
+    ('Homa Bay', 'Kenya', -0.5273, 34.4571),
+    ('Migori', 'Kenya', -1.0634, 34.4731),
+    ('Kakamega', 'Kenya', 0.2827, 34.7519),
+    ('Kapsabet', 'Kenya', 0.2037, 35.1050),
+    ('Bungoma', 'Kenya', 0.5635, 34.5606),
+    ('Busia', 'Kenya', 0.4608, 34.1115),
+    ('Kitale', 'Kenya', 1.0157, 35.0062),
+    ('Iten', 'Kenya', 0.6703, 35.5081),
+    ('Kabarnet', 'Kenya', 0.4919, 35.7430),
+    ('Lodwar', 'Kenya', 3.1191, 35.5973),
+    ('Garissa', 'Kenya', -0.4532, 39.6461),
+    ('Wajir', 'Kenya', 1.7471, 40.0573),
+    ('Mandera', 'Kenya', 3.9366, 41.8670),
+    # East Africa
+    ('Zanzibar', 'Tanzania', -6.1659, 39.2026),
+    ('Stone Town', 'Tanzania', -6.1622, 39.1921),
+    ('Dar es Salaam', 'Tanzania', -6.7924, 39.2083),
+    ('Arusha', 'Tanzania', -3.3869, 36.6830),
+    ('Moshi', 'Tanzania', -3.3349, 37.3404),
+    ('Kampala', 'Uganda', 0.3476, 32.5825),
+    ('Entebbe', 'Uganda', 0.0512, 32.4637),
+    ('Jinja', 'Uganda', 0.4244, 33.2042),
+    ('Kigali', 'Rwanda', -1.9441, 30.0619),
+    ('Addis Ababa', 'Ethiopia', 9.0054, 38.7636),
+    # Elsewhere in the sample data
+    ('Cape Town', 'South Africa', -33.9249, 18.4241),
+    ('Malibu', 'California', 34.0259, -118.7798),
+    ('Aspen', 'Colorado', 39.1911, -106.8175),
+    ('Manhattan', 'New York', 40.7831, -73.9712),
+    ('Tulum', 'Mexico', 20.2114, -87.4654),
+    ('Cotswolds', 'England', 51.8330, -1.8433),
+    ('Scottsdale', 'Arizona', 33.4942, -111.9261),
+)
+
+
+def _key(text):
+    return ' '.join(text.split()).lower()
+
+
+def _geocode(location, gazetteer):
+    # Same lookup as geo.geocode: the whole string, then its first comma part
+    if not location:
+        return None
+    key = _key(location)
+    return gazetteer.get(key) or gazetteer.get(key.split(',', 1)[0].strip())
+
+
+def upgrade():
+    # Plain ADD COLUMNs: a batch table rebuild would drop the search triggers
+    op.add_column('properties', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('properties', sa.Column('longitude', sa.Float(), nullable=True))
+
+    bind = op.get_bind()
+    properties = sa.table('properties', sa.column('id'), sa.column('latitude'), sa.column('longitude'))
+    gazetteer = {}
+    for place, region, lat, lng in PLACES:
+        gazetteer[_key(f'{place}, {region}')] = (lat, lng)
+        gazetteer.setdefault(_key(place), (lat, lng))
+    rows = []
+    for property_id, location in bind.execute(sa.text('SELECT id, location FROM properties')):
+        point = _geocode(location, gazetteer)
+        if point is not None:
+            rows.append({'row_id': property_id, 'latitude': point[0], 'longitude': point[1]})
+    if rows:
+        bind.execute(properties.update().where(properties.c.id == sa.bindparam('row_id'))
+                     .values(latitude=sa.bindparam('latitude'), longitude=sa.bindparam('longitude')), rows)
+
+    statements = {'postgresql': PG_UPGRADE, 'sqlite': SQLITE_UPGRADE}.get(bind.dialect.name, ())
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_properties_earth')
+    elif bind.dialect.name == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+
+    # Not batched, for the same reason (SQLite 3.35+ drops columns in place)
+    op.drop_column('properties', 'longitude')
+    op.drop_column('properties', 'latitude')
@@ -0,0 +1,70 @@
+"""Add full-text search index on properties
+
+Revision ID: a6d2f0c4b913
+Revises: f3c8a62d9e15
+Create Date: 2026-10-17 22:48:19.330415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2f0c4b913'
+down_revision = 'f3c8a62d9e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("""
+            ALTER TABLE properties ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(location, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(description, '')), 'C')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX ix_properties_search_vector ON properties USING gin (search_vector)")
+    elif bind.dialect.name == 'sqlite':
+        op.execute("""
+            CREATE VIRTUAL TABLE properties_fts USING fts5(
+                name, location, description,
+                content='properties', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2')
+        """)
+        op.execute("""
+            CREATE TRIGGER properties_fts_insert AFTER INSERT ON properties BEGIN
+                INSERT INTO properties_fts(rowid, name, location, description)
+                VALUES (new.id, new.name, new.location, new.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER properties_fts_delete AFTER DELETE ON properties BEGIN
+                INSERT INTO properties_fts(properties_fts, rowid, name, location, description)
+                VALUES ('delete', old.id, old.name, old.location, old.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER properties_fts_update AFTER UPDATE OF name, location, description ON properties BEGIN
+                INSERT INTO properties_fts(properties_fts, rowid, name, location, description)
+                VALUES ('delete', old.id, old.name, old.location, old.description);
+                INSERT INTO properties_fts(rowid, name, location, description)
+                VALUES (new.id, new.name, new.location, new.description);
+            END
+        """)
+        op.execute("INSERT INTO properties_fts(properties_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_properties_search_vector")
+        op.execute("ALTER TABLE properties DROP COLUMN IF EXISTS search_vector")
+    elif bind.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS properties_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS properties_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS properties_fts_insert")
+        op.execute("DROP TABLE IF EXISTS properties_fts")
@@ -0,0 +1,26 @@
+"""Add content_hash to property_images
+
+Revision ID: b4e9c3d17a20
+Revises: 7f2d4b8e1a63
+Create Date: 2026-10-17 18:24:40.117302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e9c3d17a20'
+down_revision = '7f2d4b8e1a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,71 @@
+"""Add amenities and property_amenities, backfilled from properties.amenities
+
+Revision ID: c52e9b17f4d8
+Revises: a6d2f0c4b913
+Create Date: 2026-10-17 23:12:40.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52e9b17f4d8'
+down_revision = 'a6d2f0c4b913'
+branch_labels = None
+depends_on = None
+
+CHUNK = 10000
+
+
+def _names(amenities):
+    # Same normalisation as models.amenity_names
+    names = []
+    for part in (amenities or '').split(','):
+        name = ' '.join(part.split()).lower()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    amenities = op.create_table('amenities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name', name='uq_amenities_name')
+    )
+    property_amenities = op.create_table('property_amenities',
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('amenity_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['amenity_id'], ['amenities.id'], name=op.f('fk_property_amenities_amenity_id_amenities')),
+    sa.ForeignKeyConstraint(['property_id'], ['properties.id'], name=op.f('fk_property_amenities_property_id_properties')),
+    sa.PrimaryKeyConstraint('property_id', 'amenity_id')
+    )
+
+    # Backfill from the comma-separated text
+    bind = op.get_bind()
+    links = [(property_id, _names(text)) for property_id, text in bind.execute(
+        sa.text('SELECT id, amenities FROM properties WHERE amenities IS NOT NULL'))]
+    names = sorted({name for _, property_names in links for name in property_names})
+    if names:
+        op.bulk_insert(amenities, [{'id': n, 'name': name} for n, name in enumerate(names, 1)])
+        if bind.dialect.name == 'postgresql':
+            op.execute("SELECT setval(pg_get_serial_sequence('amenities', 'id'), MAX(id)) FROM amenities")
+        ids = {name: n for n, name in enumerate(names, 1)}
+        rows = [{'property_id': property_id, 'amenity_id': ids[name]}
+                for property_id, property_names in links for name in property_names]
+        for i in range(0, len(rows), CHUNK):
+            op.bulk_insert(property_amenities, rows[i:i + CHUNK])
+
+    # After the load, so it is built once
+    with op.batch_alter_table('property_amenities', schema=None) as batch_op:
+        batch_op.create_index('ix_property_amenities_amenity_property', ['amenity_id', 'property_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('property_amenities', schema=None) as batch_op:
+        batch_op.drop_index('ix_property_amenities_amenity_property')
+
+    op.drop_table('property_amenities')
+    op.drop_table('amenities')
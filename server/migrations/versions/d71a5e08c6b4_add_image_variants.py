@@ -0,0 +1,46 @@
+"""Add image_variants and property_images.derivatives_status
+
+Revision ID: d71a5e08c6b4
+Revises: b4e9c3d17a20
+Create Date: 2026-10-17 21:12:05.648930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd71a5e08c6b4'
+down_revision = 'b4e9c3d17a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_variants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('image_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=20), nullable=False),
+    sa.Column('format', sa.String(length=10), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=False),
+    sa.Column('height', sa.Integer(), nullable=False),
+    sa.Column('file_name', sa.String(length=120), nullable=False),
+    sa.Column('byte_size', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['image_id'], ['property_images.id'], name=op.f('fk_image_variants_image_id_property_images')),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('image_variants', schema=None) as batch_op:
+        batch_op.create_index('ix_image_variants_image_id', ['image_id'], unique=False)
+
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('derivatives_status', sa.String(length=20), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.drop_column('derivatives_status')
+
+    with op.batch_alter_table('image_variants', schema=None) as batch_op:
+        batch_op.drop_index('ix_image_variants_image_id')
+
+    op.drop_table('image_variants')
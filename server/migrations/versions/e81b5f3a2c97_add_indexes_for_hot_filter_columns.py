@@ -0,0 +1,59 @@
+"""Add indexes for hot filter columns
+
+Revision ID: e81b5f3a2c97
+Revises: 3c7a91d0f6e2
+Create Date: 2026-10-17 15:26:52.871440
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81b5f3a2c97'
+down_revision = '3c7a91d0f6e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # property_images was only ever created by db.create_all(); create it
+    # here for databases built purely from migrations.
+    if not sa.inspect(op.get_bind()).has_table('property_images'):
+        op.create_table('property_images',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('property_id', sa.Integer(), nullable=False),
+        sa.Column('image_url', sa.String(length=255), nullable=False),
+        sa.Column('image_name', sa.String(length=100), nullable=False),
+        sa.Column('is_featured', sa.Boolean(), nullable=True),
+        sa.Column('upload_order', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.id'], name=op.f('fk_property_images_property_id_properties')),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_guest_email', ['guest_email'], unique=False)
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.create_index('ix_favorites_property_id', ['property_id'], unique=False)
+
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.create_index('ix_properties_owner_id', ['owner_id'], unique=False)
+
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.create_index('ix_property_images_property_order', ['property_id', 'upload_order'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.drop_index('ix_property_images_property_order')
+
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_index('ix_properties_owner_id')
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorites_property_id')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_guest_email')
@@ -0,0 +1,43 @@
+"""Add image_blobs for content-addressed image storage
+
+Revision ID: f3c8a62d9e15
+Revises: d71a5e08c6b4
+Create Date: 2026-10-17 22:03:51.207764
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a62d9e15'
+down_revision = 'd71a5e08c6b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_blobs',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('file_name', sa.String(length=80), nullable=False),
+    sa.Column('byte_size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('released_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash')
+    )
+    with op.batch_alter_table('image_blobs', schema=None) as batch_op:
+        batch_op.create_index('ix_image_blobs_released_at', ['released_at'], unique=False)
+
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.create_index('ix_property_images_content_hash', ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('property_images', schema=None) as batch_op:
+        batch_op.drop_index('ix_property_images_content_hash')
+
+    with op.batch_alter_table('image_blobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_image_blobs_released_at')
+
+    op.drop_table('image_blobs')
@@ -1,10 +1,11 @@
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy import DateTime
+from sqlalchemy import DateTime, event, func, inspect, select
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from config import db
+from geo import geocode
+from passwords import hasher
 
 # Models go here!
 class Owner(db.Model, SerializerMixin):
@@ -16,7 +17,10 @@ class Owner(db.Model, SerializerMixin):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone = db.Column(db.String(20), nullable=True)
-    created_at = db.Column(DateTime, default=datetime.utcnow)
+    created_at = db.Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Keyset pagination order
+    __table_args__ = (db.Index('ix_owners_created_at_id', 'created_at', 'id'),)
 
     # Relationships
     properties = db.relationship('Property', backref='owner', lazy=True, cascade='all, delete-orphan')
@@ -29,7 +33,7 @@ class Property(db.Model, SerializerMixin):
 
      # Serialization rules
 
-    serialize_rules = ('-owner.properties', '-bookings.property',)
+    serialize_rules = ('-owner.properties', '-bookings.property', '-amenity_links', '-occupancy')
 
 
     id = db.Column(db.Integer, primary_key=True)
@@ -38,14 +42,29 @@ class Property(db.Model, SerializerMixin):
     location = db.Column(db.String(100), nullable=False)
     price_per_night = db.Column(db.Float, nullable=False)
     max_guests = db.Column(db.Integer, nullable=False)
-    amenities = db.Column(db.Text, nullable=True)  # Could be JSON string
+    # Comma-separated, as the owner typed it; indexed in property_amenities on flush
+    amenities = db.Column(db.Text, nullable=True)
+    # From the gazetteer when the location changes, unless set explicitly (see geo.py)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
     owner_id = db.Column(db.Integer, db.ForeignKey('owners.id'), nullable=False)
-    created_at = db.Column(DateTime, default=datetime.utcnow)
+    created_at = db.Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Denormalized card image, kept in sync by refresh_featured_image()
+    featured_image_url = db.Column(db.String(255), nullable=True)
+
+    __table_args__ = (
+        # Keyset pagination order for listings
+        db.Index('ix_properties_created_at_id', 'created_at', 'id'),
+        # Owner dashboards
+        db.Index('ix_properties_owner_id', 'owner_id'),
+    )
 
 
     # Relationships
     bookings = db.relationship('Booking', backref='property', lazy=True, cascade='all, delete-orphan')
     images = db.relationship('PropertyImage', backref='property', lazy=True, cascade='all, delete-orphan')
+    amenity_links = db.relationship('PropertyAmenity', lazy=True, cascade='all, delete-orphan')
+    occupancy = db.relationship('PropertyOccupancy', lazy=True, cascade='all, delete-orphan')
 
 
     # Association proxy for many-to-many relationship with guests through bookings
@@ -53,12 +72,110 @@ class Property(db.Model, SerializerMixin):
 
     #  method to get the featured image
     def get_featured_image(self):
-        featured = PropertyImage.query.filter_by(property_id=self.id, is_featured=True).first()
-        if featured:
-            return featured.image_url
+        if self.featured_image_url:
+            return self.featured_image_url
+        return Property.featured_image_urls([self.id]).get(self.id)
+
+    @staticmethod
+    def featured_image_urls(property_ids):
+        """
+        Map property id -> card image url for many properties in one query.
+        The featured image wins; otherwise the first image by upload order.
+        """
+        if not property_ids:
+            return {}
+        rank = func.row_number().over(
+            partition_by=PropertyImage.property_id,
+            order_by=(PropertyImage.is_featured.desc(),
+                      func.coalesce(PropertyImage.upload_order, 0),
+                      PropertyImage.id),
+        ).label('rank')
+        ranked = (
+            select(PropertyImage.property_id, PropertyImage.image_url, rank)
+            .where(PropertyImage.property_id.in_(property_ids))
+            .subquery()
+        )
+        rows = db.session.execute(
+            select(ranked.c.property_id, ranked.c.image_url).where(ranked.c.rank == 1)
+        )
+        return {property_id: image_url for property_id, image_url in rows}
+
+    def refresh_featured_image(self):
+        """Re-derive featured_image_url after the image set changes."""
+        self.featured_image_url = Property.featured_image_urls([self.id]).get(self.id)
     
     def __repr__(self):
         return f'<Property {self.name}>'
+
+
+def amenity_names(amenities):
+    """Normalised names in a comma-separated amenity list: lower case, single spaces, no repeats."""
+    names = []
+    for part in (amenities or '').split(','):
+        name = ' '.join(part.split()).lower()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class Amenity(db.Model, SerializerMixin):
+    __tablename__ = 'amenities'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # normalised by amenity_names()
+
+    __table_args__ = (db.UniqueConstraint('name', name='uq_amenities_name'),)
+
+    @staticmethod
+    def ids(session, names):
+        """Map each of ``names`` to its amenity id, adding the ones not seen before."""
+        if not names:
+            return {}
+        if session.get_bind().dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        # Concurrent writers may add the same new name; the constraint keeps one
+        session.execute(insert(Amenity).values([{'name': name} for name in names]).on_conflict_do_nothing())
+        return dict(session.execute(select(Amenity.name, Amenity.id).where(Amenity.name.in_(names))).all())
+
+    def __repr__(self):
+        return f'<Amenity {self.name}>'
+
+
+class PropertyAmenity(db.Model):
+    __tablename__ = 'property_amenities'
+
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), primary_key=True)
+    amenity_id = db.Column(db.Integer, db.ForeignKey('amenities.id'), primary_key=True)
+
+    # Amenity filters start from the amenity and read property ids off the index
+    __table_args__ = (db.Index('ix_property_amenities_amenity_property', 'amenity_id', 'property_id'),)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _index_amenities(session, flush_context, instances):
+    # Keep property_amenities in step with the amenities text of changed properties
+    changed = [obj for obj in list(session.new) + list(session.dirty)
+               if isinstance(obj, Property) and inspect(obj).attrs.amenities.history.has_changes()]
+    for prop in changed:
+        ids = Amenity.ids(session, amenity_names(prop.amenities))
+        current = {link.amenity_id: link for link in prop.amenity_links}
+        prop.amenity_links = [current.get(amenity_id) or PropertyAmenity(amenity_id=amenity_id)
+                              for amenity_id in ids.values()]
+
+
+@event.listens_for(db.session, 'before_flush')
+def _geocode_locations(session, flush_context, instances):
+    # Coordinates follow the location unless the same change set them
+    for prop in list(session.new) + list(session.dirty):
+        if not isinstance(prop, Property):
+            continue
+        attrs = inspect(prop).attrs
+        explicit = (attrs.latitude.history.has_changes() and prop.latitude is not None
+                    and attrs.longitude.history.has_changes() and prop.longitude is not None)
+        if attrs.location.history.has_changes() and not explicit:
+            prop.latitude, prop.longitude = geocode(prop.location) or (None, None)
      
 class Booking(db.Model, SerializerMixin):
     __tablename__ = 'bookings'
@@ -74,15 +191,37 @@ class Booking(db.Model, SerializerMixin):
     check_out_date = db.Column(db.Date, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
     booking_status = db.Column(db.String(20), default='confirmed')  # confirmed, cancelled
-    created_at = db.Column(DateTime, default=datetime.utcnow)
+    created_at = db.Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Covers the availability anti-join and per-property conflict checks
+    __table_args__ = (
+        db.Index('ix_bookings_property_status_dates',
+                 'property_id', 'booking_status', 'check_in_date', 'check_out_date'),
+        # Keyset pagination order
+        db.Index('ix_bookings_created_at_id', 'created_at', 'id'),
+        # A guest's reservations
+        db.Index('ix_bookings_guest_email', 'guest_email'),
+    )
     
     def __repr__(self):
         return f'<Booking {self.guest_name} - Property {self.property_id}>'
+
+
+class PropertyOccupancy(db.Model):
+    __tablename__ = 'property_occupancy'
+
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    # Bit day-1 set when that night is booked; maintained by occupancy.py
+    nights = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<PropertyOccupancy {self.property_id} {self.month:%Y-%m} {self.nights:031b}>'
 class PropertyImage(db.Model, SerializerMixin):
     __tablename__ = 'property_images'
     
     # Serialization rules
-    serialize_rules = ('-property.images',)
+    serialize_rules = ('-property.images', '-variants')
     
     id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
@@ -90,12 +229,61 @@ class PropertyImage(db.Model, SerializerMixin):
     image_name = db.Column(db.String(100), nullable=False)
     is_featured = db.Column(db.Boolean, default=False)  # Main property image
     upload_order = db.Column(db.Integer, default=0)  # For image ordering
+    content_hash = db.Column(db.String(64))  # sha256 of the uploaded file, None for URL images
+    # Resized copies: pending, ready, failed or skipped; None for URL images
+    derivatives_status = db.Column(db.String(20))
     created_at = db.Column(DateTime, default=datetime.utcnow)
+
+    # Image galleries are always read per property in upload order
+    __table_args__ = (
+        db.Index('ix_property_images_property_order', 'property_id', 'upload_order'),
+        # Other images sharing a stored file (see image_store.py)
+        db.Index('ix_property_images_content_hash', 'content_hash'),
+    )
+
+    variants = db.relationship('ImageVariant', backref='image', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<PropertyImage {self.image_name}>'
 
 
+class ImageVariant(db.Model, SerializerMixin):
+    __tablename__ = 'image_variants'
+
+    serialize_rules = ('-image',)
+
+    id = db.Column(db.Integer, primary_key=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('property_images.id'), nullable=False)
+    name = db.Column(db.String(20), nullable=False)  # thumb, medium, full
+    format = db.Column(db.String(10), nullable=False)  # jpeg, png, webp
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    file_name = db.Column(db.String(120), nullable=False)
+    byte_size = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index('ix_image_variants_image_id', 'image_id'),)
+
+    def __repr__(self):
+        return f'<ImageVariant {self.file_name}>'
+
+
+class ImageBlob(db.Model, SerializerMixin):
+    __tablename__ = 'image_blobs'
+
+    content_hash = db.Column(db.String(64), primary_key=True)  # sha256
+    file_name = db.Column(db.String(80), nullable=False)  # <content_hash>.<ext>
+    byte_size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    released_at = db.Column(DateTime)  # When ref_count last dropped to zero
+
+    # The garbage collector looks for long-released blobs
+    __table_args__ = (db.Index('ix_image_blobs_released_at', 'released_at'),)
+
+    def __repr__(self):
+        return f'<ImageBlob {self.file_name} refs={self.ref_count}>'
+
+
 class User(db.Model, SerializerMixin):
     __tablename__ = 'users'
     
@@ -107,12 +295,18 @@ class User(db.Model, SerializerMixin):
     name = db.Column(db.String(100), nullable=False)
     user_type = db.Column(db.String(20), default='guest')  # guest, owner
     created_at = db.Column(DateTime, default=datetime.utcnow)
+    # Bumped whenever a field carried in access token claims changes
+    profile_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)        
+        return hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.password_hash)
+
 class Favorite(db.Model):
     __tablename__ = 'favorites'
     
@@ -125,8 +319,12 @@ class Favorite(db.Model):
     user = db.relationship('User', backref=db.backref('favorites', lazy=True))
     property = db.relationship('Property', backref=db.backref('favorited_by', lazy=True))
     
-    # Ensure a user can't favorite the same property twice
-    __table_args__ = (db.UniqueConstraint('user_id', 'property_id', name='unique_user_property_favorite'),)
+    # Ensure a user can't favorite the same property twice. The constraint's
+    # index also serves lookups by user_id.
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'property_id', name='unique_user_property_favorite'),
+        db.Index('ix_favorites_property_id', 'property_id'),
+    )
     
     def to_dict(self):
         return {
@@ -0,0 +1,173 @@
+"""
+Proximity search for ``GET /api/properties/nearby``.
+
+Properties within ``radius_km`` of a point (``lat``/``lng``, or ``near=<place>``
+resolved by the gazetteer in geo.py), nearest first. The spatial index
+narrows the candidates to the bounding box of the circle, so the cost
+follows the number of listings nearby rather than the size of the table:
+
+    PostgreSQL  a GiST index on ``ll_to_earth(latitude, longitude)``
+                (cube + earthdistance extensions), searched with earth_box
+    SQLite      an R*Tree ``properties_geo`` kept in sync by triggers
+
+Exact great-circle distances are then computed for the candidates only.
+Both are created by the migration, and alongside the table by
+``db.create_all()`` (and dropped by ``db.drop_all()``). The price, guest
+and amenity filters from search.py apply as well.
+"""
+
+from sqlalchemy import and_, column, event, func, inspect, or_, table, text
+
+from config import db
+from geo import bounding_box, geocode
+from models import Property
+from pagination import encode_cursor, parse_page_args
+from search import InvalidSearch, filters
+
+DEFAULT_RADIUS_KM = 20
+MAX_RADIUS_KM = 500
+
+PG_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS cube",
+    "CREATE EXTENSION IF NOT EXISTS earthdistance",
+    "CREATE INDEX IF NOT EXISTS ix_properties_earth ON properties USING gist (ll_to_earth(latitude, longitude))",
+)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE properties_geo USING rtree(id, min_lat, max_lat, min_lng, max_lng)",
+    """CREATE TRIGGER properties_geo_insert AFTER INSERT ON properties
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO properties_geo VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END""",
+    """CREATE TRIGGER properties_geo_delete AFTER DELETE ON properties BEGIN
+        DELETE FROM properties_geo WHERE id = old.id;
+    END""",
+    """CREATE TRIGGER properties_geo_update AFTER UPDATE OF latitude, longitude ON properties BEGIN
+        DELETE FROM properties_geo WHERE id = old.id;
+        INSERT INTO properties_geo SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END""",
+    # Index the rows that already exist
+    """INSERT INTO properties_geo SELECT id, latitude, latitude, longitude, longitude FROM properties
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL""",
+)
+
+SQLITE_DROP = (
+    "DROP TRIGGER IF EXISTS properties_geo_update",
+    "DROP TRIGGER IF EXISTS properties_geo_delete",
+    "DROP TRIGGER IF EXISTS properties_geo_insert",
+    "DROP TABLE IF EXISTS properties_geo",
+)
+
+
+def install(connection):
+    """Create the spatial index for ``connection``'s backend if it is missing."""
+    if connection.dialect.name == 'postgresql':
+        statements = PG_DDL
+    elif connection.dialect.name == 'sqlite':
+        if inspect(connection).has_table('properties_geo'):
+            return
+        statements = SQLITE_DDL
+    else:
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def uninstall(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('DROP INDEX IF EXISTS ix_properties_earth'))
+    elif connection.dialect.name == 'sqlite':
+        for statement in SQLITE_DROP:
+            connection.execute(text(statement))
+
+
+@event.listens_for(Property.__table__, 'after_create')
+def _install_with_table(target, connection, **kw):
+    install(connection)
+
+
+@event.listens_for(Property.__table__, 'before_drop')
+def _uninstall_with_table(target, connection, **kw):
+    uninstall(connection)
+
+
+def _coordinate(source, name, low, high):
+    try:
+        value = float(source.get(name))
+    except (TypeError, ValueError):
+        raise InvalidSearch(f'{name} must be a number')
+    if not low <= value <= high:
+        raise InvalidSearch(f'{name} must be between {low} and {high}')
+    return value
+
+
+def _origin(source):
+    if source.get('near') and source.get('lat') in (None, '') and source.get('lng') in (None, ''):
+        point = geocode(source['near'])
+        if point is None:
+            raise InvalidSearch(f'Unknown place: {source["near"]}')
+        return point
+    if source.get('lat') in (None, '') or source.get('lng') in (None, ''):
+        raise InvalidSearch('lat and lng (or near) are required')
+    return _coordinate(source, 'lat', -90, 90), _coordinate(source, 'lng', -180, 180)
+
+
+def _radius(source):
+    if source.get('radius_km') in (None, ''):
+        return DEFAULT_RADIUS_KM
+    radius = _coordinate(source, 'radius_km', 0, MAX_RADIUS_KM)
+    if radius <= 0:
+        raise InvalidSearch('radius_km must be positive')
+    return radius
+
+
+def _within(lat, lng, radius_km):
+    """(query over (Property, distance), distance expression) for properties within the radius."""
+    if db.engine.dialect.name == 'postgresql':
+        origin = func.ll_to_earth(lat, lng)
+        point = func.ll_to_earth(Property.latitude, Property.longitude)
+        distance = func.earth_distance(origin, point) / 1000.0
+        query = (db.session.query(Property, distance)
+                 .filter(func.earth_box(origin, radius_km * 1000.0).op('@>')(point)))
+    else:
+        geo = table('properties_geo', column('id'), column('min_lat'), column('max_lat'),
+                    column('min_lng'), column('max_lng'))
+        south, north, spans = bounding_box(lat, lng, radius_km)
+        distance = func.haversine_km(lat, lng, Property.latitude, Property.longitude)
+        query = (db.session.query(Property, distance)
+                 .join(geo, geo.c.id == Property.id)
+                 # Overlap tests: R*Tree boxes are 32-bit floats rounded outwards
+                 .filter(geo.c.max_lat >= south, geo.c.min_lat <= north,
+                         or_(*(and_(geo.c.max_lng >= west, geo.c.min_lng <= east) for west, east in spans))))
+    return query.filter(distance <= radius_km), distance
+
+
+def nearby_page(source, serialize, prepare=lambda query: query):
+    """
+    One page of properties around the point in ``source``, nearest first, as
+    ``{"items": [...], "next_cursor": ...}``; each item is ``serialize(property)``
+    plus its ``distance_km``. ``prepare`` adds loader options.
+    """
+    lat, lng = _origin(source)
+    radius_km = _radius(source)
+    query, distance = _within(lat, lng, radius_km)
+
+    columns = (distance.label('distance_km'), Property.id)
+    limit, after = parse_page_args(source, columns)
+    query = prepare(query.filter(*filters(source)))
+    if after is not None:
+        last_distance, last_id = after
+        query = query.filter(or_(distance > last_distance, and_(distance == last_distance, Property.id > last_id)))
+    rows = query.order_by(distance, Property.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_distance = rows[-1]
+        next_cursor = encode_cursor([last_distance, last.id])
+
+    return {
+        "items": [dict(serialize(row), distance_km=round(row_distance, 3)) for row, row_distance in rows],
+        "next_cursor": next_cursor,
+    }
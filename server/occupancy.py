@@ -0,0 +1,175 @@
+"""
+Materialised occupancy calendar for ``GET /api/properties/<id>/calendar``.
+
+``property_occupancy`` holds one row per property and month with a 31-bit
+mask of booked nights: bit ``day - 1`` is set when the night starting on
+that day is taken by a confirmed booking. A stay sets its nights when it is
+created or re-confirmed and clears them when it is cancelled, each as a
+single ``|``/``&`` update per month it spans, inside the booking's own
+transaction. Confirmed stays never overlap, so clearing one booking's nights
+never touches another's. Missing rows mean an empty month.
+
+The calendar comes back as one string with a character per night from
+``from`` (inclusive) to ``to`` (exclusive), ``1`` for booked, e.g.
+``"0001111000..."``.
+
+The table can be rebuilt from the bookings, e.g. after bulk edits:
+
+    python occupancy.py             # every property
+    python occupancy.py 12 40       # just these
+"""
+
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, delete, select, update
+
+from config import app, db
+from models import Booking, PropertyOccupancy
+
+log = logging.getLogger('jambostays.occupancy')
+
+MONTH_BITS = 31
+FULL_MONTH = (1 << MONTH_BITS) - 1
+DEFAULT_DAYS = 90
+MAX_DAYS = 366
+
+
+class InvalidRange(ValueError):
+    pass
+
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def month_masks(check_in, check_out):
+    """``[(month, mask), ...]`` for the nights from check_in up to check_out."""
+    masks = []
+    day = check_in
+    while day < check_out:
+        end = min(check_out, _next_month(_month(day)))
+        masks.append((_month(day), ((1 << (end - day).days) - 1) << (day.day - 1)))
+        day = end
+    return masks
+
+
+def _insert():
+    # INSERT ... ON CONFLICT, as spelled by the backend (PostgreSQL or SQLite)
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(PropertyOccupancy)
+
+
+def book(booking):
+    """Mark ``booking``'s nights as taken; commits with the caller's transaction."""
+    masks = month_masks(booking.check_in_date, booking.check_out_date)
+    if not masks:
+        return
+    statement = _insert().values([{'property_id': booking.property_id, 'month': month, 'nights': mask}
+                                  for month, mask in masks])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['property_id', 'month'],
+        set_={'nights': PropertyOccupancy.nights.op('|')(statement.excluded.nights)},
+    ))
+
+
+def release(booking):
+    """Free ``booking``'s nights again."""
+    masks = month_masks(booking.check_in_date, booking.check_out_date)
+    if not masks:
+        return
+    table = PropertyOccupancy.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.property_id == bindparam('row_property_id'), table.c.month == bindparam('row_month'))
+        .values(nights=table.c.nights.op('&')(bindparam('keep'))),
+        [{'row_property_id': booking.property_id, 'row_month': month, 'keep': FULL_MONTH ^ mask}
+         for month, mask in masks],
+    )
+
+
+def parse_range(source):
+    """``(from, to)`` dates from request args; ``to`` is exclusive."""
+    try:
+        start = date.fromisoformat(source['from']) if source.get('from') else date.today()
+        end = date.fromisoformat(source['to']) if source.get('to') else start + timedelta(days=DEFAULT_DAYS)
+    except ValueError:
+        raise InvalidRange('from and to must be dates (YYYY-MM-DD)')
+    if end <= start:
+        raise InvalidRange('to must be after from')
+    if (end - start).days > MAX_DAYS:
+        raise InvalidRange(f'at most {MAX_DAYS} days at a time')
+    return start, end
+
+
+def nights(property_id, start, end):
+    """Booked nights from start up to end, one ``0``/``1`` character each."""
+    months = dict(db.session.execute(
+        select(PropertyOccupancy.month, PropertyOccupancy.nights)
+        .where(PropertyOccupancy.property_id == property_id,
+               PropertyOccupancy.month >= _month(start), PropertyOccupancy.month < end)
+    ).all())
+    days = (start + timedelta(days=n) for n in range((end - start).days))
+    return ''.join('1' if months.get(_month(day), 0) >> (day.day - 1) & 1 else '0' for day in days)
+
+
+def _rows(stays):
+    """Occupancy rows for ``(property_id, check_in, check_out)`` stays grouped by property."""
+    current, months = None, {}
+    for property_id, check_in, check_out in stays:
+        if property_id != current:
+            yield from ({'property_id': current, 'month': month, 'nights': mask}
+                        for month, mask in sorted(months.items()))
+            current, months = property_id, {}
+        for month, mask in month_masks(check_in, check_out):
+            months[month] = months.get(month, 0) | mask
+    yield from ({'property_id': current, 'month': month, 'nights': mask}
+                for month, mask in sorted(months.items()))
+
+
+def rebuild(property_ids=None, chunk=10000):
+    """Recompute the calendar of ``property_ids`` (default all) from confirmed bookings."""
+    clear = delete(PropertyOccupancy)
+    stays = (select(Booking.property_id, Booking.check_in_date, Booking.check_out_date)
+             .where(Booking.booking_status == 'confirmed')
+             .order_by(Booking.property_id))
+    if property_ids is not None:
+        clear = clear.where(PropertyOccupancy.property_id.in_(property_ids))
+        stays = stays.where(Booking.property_id.in_(property_ids))
+    db.session.execute(clear)
+
+    written, batch = 0, []
+    for row in _rows(db.session.execute(stays.execution_options(yield_per=chunk))):
+        batch.append(row)
+        if len(batch) >= chunk:
+            db.session.execute(PropertyOccupancy.__table__.insert(), batch)
+            written, batch = written + len(batch), []
+    if batch:
+        db.session.execute(PropertyOccupancy.__table__.insert(), batch)
+        written += len(batch)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuild property occupancy calendars from bookings.')
+    parser.add_argument('property_ids', nargs='*', type=int, help='only these properties')
+    args = parser.parse_args(argv)
+
+    with app.app_context():
+        began = time.perf_counter()
+        months = rebuild(args.property_ids or None)
+        db.session.commit()
+    log.info('Rebuilt %d occupancy months in %.1fs', months, time.perf_counter() - began)
+
+
+if __name__ == '__main__':
+    main()
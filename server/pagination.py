@@ -0,0 +1,113 @@
+"""
+Keyset (cursor) pagination helpers for JamboStays list endpoints.
+
+A page is selected with ``WHERE (col1, col2, ...) > (last values)`` instead of
+OFFSET, so fetching page 500 costs the same as fetching page 1. The cursor
+handed back to clients is an opaque url-safe string wrapping the sort-key
+values of the last row on the page. Sort columns must be NOT NULL: a NULL
+compares neither greater than nor equal to the cursor, so those rows would
+be skipped.
+
+``limit`` and ``cursor`` are read from the query string on every endpoint.
+POST endpoints that take their filters as JSON (``/api/properties/available``)
+also accept them in the body; the query string wins when both are given.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_, Date, DateTime
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidPageRequest('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidPageRequest('Invalid cursor')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        try:
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+        except (ValueError, TypeError):
+            raise InvalidPageRequest('Invalid cursor')
+        decoded.append(value)
+    return decoded
+
+
+def wants_page(source):
+    """True when the caller asked for a paginated response."""
+    return source is not None and ('limit' in source or 'cursor' in source)
+
+
+def parse_page_args(source, columns):
+    """Read ``limit`` and ``cursor`` from request args or a JSON body."""
+    try:
+        limit = int(source.get('limit', DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        raise InvalidPageRequest('limit must be an integer')
+    if limit < 1:
+        raise InvalidPageRequest('limit must be at least 1')
+    limit = min(limit, MAX_LIMIT)
+
+    cursor = source.get('cursor')
+    after = decode_cursor(cursor, columns) if cursor else None
+    return limit, after
+
+
+def keyset_page(query, columns, limit, after=None):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``query`` ordered by
+    ``columns`` ascending. ``next_cursor`` is None on the last page.
+    """
+    if after is not None:
+        # Expanded form of (c1, c2, ...) > (v1, v2, ...) so every backend can
+        # use a composite index on the sort columns.
+        clauses = []
+        for i, column in enumerate(columns):
+            equal_prefix = [columns[j] == after[j] for j in range(i)]
+            clauses.append(and_(*equal_prefix, column > after[i]))
+        query = query.filter(or_(*clauses))
+
+    rows = query.order_by(*columns).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
+
+
+def paginate(query, columns, source, serialize=lambda row: row.to_dict()):
+    """
+    Serialize ``query`` for a list endpoint. Without ``limit``/``cursor`` in
+    ``source`` the legacy bare list is returned; otherwise a page envelope
+    ``{"items": [...], "next_cursor": ...}``.
+    """
+    if not wants_page(source):
+        return [serialize(row) for row in query.order_by(*columns).all()]
+
+    limit, after = parse_page_args(source, columns)
+    rows, next_cursor = keyset_page(query, columns, limit, after)
+    return {"items": [serialize(row) for row in rows], "next_cursor": next_cursor}
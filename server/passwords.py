@@ -0,0 +1,139 @@
+"""
+Password hashing with configurable cost, run off the request thread.
+
+Hashes are produced and checked by werkzeug (scrypt or pbkdf2) in a small
+process pool, so a burst of logins queues for CPU in the pool instead of
+holding request threads and the GIL. The pool is bounded: once
+``PASSWORD_HASH_MAX_PENDING`` hashes are queued, further requests fail fast
+with ``PasswordHasherBusy`` and the API answers 503.
+
+Configuration (environment):
+
+    PASSWORD_HASH_METHOD        werkzeug method string, e.g. scrypt:32768:8:1
+                                (default) or pbkdf2:sha256:600000
+    PASSWORD_SALT_LENGTH        salt characters (default 16)
+    PASSWORD_HASH_WORKERS       pool processes per web worker (default: CPU
+                                count divided by WEB_CONCURRENCY, at least 1;
+                                0 hashes inline on the request thread)
+    PASSWORD_HASH_MAX_PENDING   hashes queued or running before rejecting
+                                (default 4 per pool process)
+    PASSWORD_HASH_TIMEOUT       seconds to wait for a result before answering
+                                503 (default 10)
+    WEB_CONCURRENCY             web worker processes per host, as read by
+                                gunicorn (default 1)
+
+Changing the method or its cost only affects new hashes; a user whose
+stored hash uses other parameters is rehashed the next time they log in.
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as ResultTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(RuntimeError):
+    pass
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return default if value in (None, '') else int(value)
+
+
+def default_workers():
+    # Every web worker has its own pool; share the host's CPUs between them
+    return max(1, (os.cpu_count() or 1) // max(1, _env_int('WEB_CONCURRENCY', 1)))
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', salt_length=16, workers=None, max_pending=None, timeout=10):
+        self._lock = threading.Lock()
+        self._pool = None
+        self.configure(method, salt_length, workers, max_pending, timeout)
+
+    @classmethod
+    def from_env(cls):
+        workers = os.environ.get('PASSWORD_HASH_WORKERS')
+        max_pending = os.environ.get('PASSWORD_HASH_MAX_PENDING')
+        return cls(
+            method=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'),
+            salt_length=_env_int('PASSWORD_SALT_LENGTH', 16),
+            workers=int(workers) if workers not in (None, '') else None,
+            max_pending=int(max_pending) if max_pending not in (None, '') else None,
+            timeout=_env_int('PASSWORD_HASH_TIMEOUT', 10),
+        )
+
+    def configure(self, method='scrypt', salt_length=16, workers=None, max_pending=None, timeout=10):
+        """(Re)configure the hasher; an existing pool is shut down."""
+        self.shutdown()
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = default_workers() if workers is None else workers
+        self.max_pending = max_pending or 4 * max(self.workers, 1)
+        self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._prefix = None
+
+    @property
+    def prefix(self):
+        """Normalised method string, e.g. ``scrypt:32768:8:1``, as stored in hashes."""
+        if self._prefix is None:
+            # werkzeug fills in default parameters; let it tell us what they are
+            self._prefix = generate_password_hash('', self.method, self.salt_length).split('$', 1)[0]
+        return self._prefix
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: request threads may hold locks a forked child would inherit
+                self._pool = ProcessPoolExecutor(self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        # Released on the semaphore it was taken from, even if reconfigured meanwhile
+        pending = self._pending
+        if not pending.acquire(blocking=False):
+            raise PasswordHasherBusy('Too many password checks in progress')
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            pending.release()
+            raise
+        future.add_done_callback(lambda _: pending.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except ResultTimeout:
+            # Still queued behind other hashes: drop it and tell the client to retry
+            future.cancel()
+            raise PasswordHasherBusy('Password check timed out')
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next call
+            self.shutdown()
+            raise
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.prefix
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher.from_env()
+atexit.register(hasher.shutdown)
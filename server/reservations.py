@@ -0,0 +1,82 @@
+"""
+Race-free booking reservation.
+
+Two requests for overlapping dates on the same property must not both
+commit. Reservations for one property are serialised by locking that
+property's row for the rest of the transaction; reservations for different
+properties never wait on each other.
+
+* PostgreSQL (and other row-locking backends): ``SELECT ... FOR UPDATE``.
+* SQLite: no row locks, so a no-op ``UPDATE`` of the property takes the
+  database write lock up front, before the overlap check reads anything.
+"""
+
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from availability import overlaps_stay
+from config import db
+from models import Property, Booking
+from stay_index import stay_index
+
+
+def lock_property(property_id):
+    """Load and lock a property until the current transaction ends."""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        properties = Property.__table__
+        db.session.execute(
+            update(properties)
+            .where(properties.c.id == property_id)
+            .values(id=properties.c.id)
+        )
+    return (
+        db.session.query(Property)
+        .filter(Property.id == property_id)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+
+
+def indexed_conflict(property_id, check_in, check_out):
+    """
+    Lock-free pre-check against the in-process stay index, so requests for
+    dates that are obviously taken are rejected without queueing on the lock.
+    A hit is confirmed by primary key in case another worker cancelled it.
+    """
+    booking_id = stay_index.conflict(property_id, check_in, check_out)
+    if booking_id is None:
+        return None
+
+    status = db.session.query(Booking.booking_status).filter(Booking.id == booking_id).scalar()
+    if status == 'confirmed':
+        return booking_id
+
+    stay_index.invalidate(property_id)
+    return stay_index.conflict(property_id, check_in, check_out)
+
+
+def locked_conflict(property_id, check_in, check_out):
+    """Authoritative overlap check. Call with the property locked."""
+    return (
+        db.session.query(Booking.id)
+        .filter(Booking.property_id == property_id, overlaps_stay(check_in, check_out))
+        .limit(1)
+        .scalar()
+    )
+
+
+def release_confirmed(booking, status='cancelled'):
+    """
+    Move ``booking`` out of ``confirmed`` with a conditional UPDATE; True only
+    for the one transaction that made the change, which alone may then free
+    the nights (two overlapping cancels both read ``confirmed`` otherwise).
+    """
+    bookings = Booking.__table__
+    result = db.session.execute(
+        update(bookings)
+        .where(bookings.c.id == booking.id, bookings.c.booking_status == 'confirmed')
+        .values(booking_status=status)
+    )
+    set_committed_value(booking, 'booking_status', status)
+    return result.rowcount == 1
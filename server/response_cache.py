@@ -0,0 +1,233 @@
+"""
+Read-through response cache for the public property endpoints.
+
+Responses are keyed by path and query string and tagged with what they
+depend on: ``properties`` (which properties exist) and ``property:<id>``
+for every property in the payload. Each entry remembers the tag versions
+it was built against; writes bump the versions of the tags they touch, so
+only the entries that could have changed are invalidated. Every response
+carries an ETag, and a matching ``If-None-Match`` gets a 304.
+
+A bump stamps its tags with the next value of a shared clock. Per-row tags
+are only known once the view has rendered, so a render notes the clock
+first and is not stored if any of its tags was bumped after that: a write
+that commits mid-render is never cached under its new version.
+
+Configuration (environment):
+
+    RESPONSE_CACHE              lru (default), redis or none
+    RESPONSE_CACHE_URL          redis://localhost:6379/0 for the redis backend
+    RESPONSE_CACHE_TTL          seconds an entry lives (default 300)
+    RESPONSE_CACHE_MAX_ENTRIES  LRU capacity per worker (default 1024)
+
+The LRU backend is per worker process, so invalidations only reach the
+worker that handled the write; other workers catch up within the TTL. Use
+the redis backend (``pip install redis``; any Redis-compatible server) to
+share the cache and invalidations across workers.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+
+class LRUBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def clock(self):
+        with self._lock:
+            return self._clock
+
+    def bump(self, tags):
+        with self._lock:
+            self._clock += 1
+            for tag in tags:
+                self._versions[tag] = self._clock
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class RedisBackend:
+    PREFIX = 'jambostays:cache:'
+    # Advance the clock and stamp every tag with it, atomically
+    BUMP = """
+        local now = redis.call('INCR', KEYS[1])
+        for i = 2, #KEYS do redis.call('SET', KEYS[i], now) end
+        return now
+    """
+
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError('RESPONSE_CACHE=redis requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self._bump = self.client.register_script(self.BUMP)
+
+    def get(self, key):
+        raw = self.client.get(self.PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.PREFIX + key, ttl, json.dumps(value))
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        return [int(v or 0) for v in self.client.mget([self.PREFIX + 'tag:' + t for t in tags])]
+
+    def clock(self):
+        return int(self.client.get(self.PREFIX + 'clock') or 0)
+
+    def bump(self, tags):
+        self._bump(keys=[self.PREFIX + 'clock'] + [self.PREFIX + 'tag:' + t for t in tags])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.PREFIX + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls):
+        kind = os.environ.get('RESPONSE_CACHE', 'lru').lower()
+        ttl = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+        if kind == 'none':
+            return cls(None, ttl)
+        if kind == 'redis':
+            url = os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+            return cls(RedisBackend(url), ttl)
+        return cls(LRUBackend(int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))), ttl)
+
+    def cached(self, *base_tags):
+        """
+        Cache a GET view. ``base_tags`` may use the view's URL arguments,
+        e.g. ``'property:{id}'``; views add per-row tags with ``tag()``.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                key = request.full_path
+                entry = self.backend.get(key)
+                if entry is not None and self.backend.versions(entry['tags']) == entry['versions']:
+                    response = self._response(entry['body'], entry['etag'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response.make_conditional(request)
+
+                # Read the clock and tag versions before rendering so a write
+                # that lands mid-render leaves this entry already stale.
+                started = self.backend.clock()
+                tags = [tag.format(**kwargs) for tag in base_tags]
+                versions_before = dict(zip(tags, self.backend.versions(tags)))
+                g.cache_tags = set(tags)
+
+                rv = view(*args, **kwargs)
+                response = current_app.make_response(rv)
+                if response.status_code != 200 or response.mimetype != 'application/json':
+                    return response
+
+                body = response.get_data(as_text=True)
+                etag = hashlib.sha1(body.encode()).hexdigest()
+                entry_tags = sorted(g.cache_tags)
+                new_tags = [t for t in entry_tags if t not in versions_before]
+                versions_before.update(zip(new_tags, self.backend.versions(new_tags)))
+                # A row tag bumped since the render began may be stale in the body
+                if all(versions_before[t] <= started for t in new_tags):
+                    self.backend.set(key, {
+                        'body': body,
+                        'etag': etag,
+                        'tags': entry_tags,
+                        'versions': [versions_before[t] for t in entry_tags],
+                    }, self.ttl)
+
+                response = self._response(body, etag)
+                response.headers['X-Cache'] = 'MISS'
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+    def _response(self, body, etag):
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.bump(tags)
+
+    def invalidate_property(self, property_id, membership=False):
+        """A property's payload changed; ``membership`` if it was added or removed."""
+        tags = [f'property:{property_id}']
+        if membership:
+            tags.append('properties')
+        self.invalidate(*tags)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+
+def tag(*tags):
+    """Record extra tags for the response being rendered, if it is cached."""
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
+
+
+def tag_properties(serialize):
+    """Wrap a property serializer so each row tags the cached response."""
+    def wrapper(property):
+        tag(f'property:{property.id}')
+        return serialize(property)
+    return wrapper
+
+
+response_cache = ResponseCache.from_env()
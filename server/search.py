@@ -0,0 +1,210 @@
+"""
+Full-text and faceted property search for ``GET /api/properties/search``.
+
+Text search covers name, location and description, weighted in that order,
+with stemming and prefix matching so "beach vil" finds "Beachfront Villa".
+Every word must match. The index depends on the backend:
+
+    PostgreSQL  a stored generated ``properties.search_vector`` tsvector
+                (name A, location B, description C) with a GIN index,
+                ranked by ts_rank_cd
+    SQLite      an external-content FTS5 table ``properties_fts`` kept in
+                sync by triggers, ranked by bm25 with the same weighting
+
+Both are created by the migration, and alongside the table by
+``db.create_all()`` (and dropped by ``db.drop_all()``). Neither is mapped on
+``Property``.
+
+Filters (all optional): ``min_price``/``max_price`` on price_per_night,
+``guests`` (max_guests at least this many) and ``amenities`` (comma
+separated, all required, matched by normalised name through the
+``property_amenities`` index). Results are always paginated; with ``q`` they are
+ordered by score, otherwise by id.
+"""
+
+import re
+
+from sqlalchemy import and_, column, event, func, inspect, literal_column, or_, select, table, text
+
+from config import db
+from models import Amenity, Property, PropertyAmenity, amenity_names
+from pagination import encode_cursor, parse_page_args
+
+PG_CONFIG = 'english'
+# bm25 column weights for name, location, description
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+MAX_TERMS = 8
+
+_TERM = re.compile(r'[^\W_]+')
+
+
+class InvalidSearch(ValueError):
+    pass
+
+
+PG_DDL = (
+    f"""ALTER TABLE properties ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('{PG_CONFIG}', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('{PG_CONFIG}', coalesce(location, '')), 'B') ||
+            setweight(to_tsvector('{PG_CONFIG}', coalesce(description, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_properties_search_vector ON properties USING gin (search_vector)",
+)
+
+SQLITE_DDL = (
+    """CREATE VIRTUAL TABLE properties_fts USING fts5(
+        name, location, description,
+        content='properties', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER properties_fts_insert AFTER INSERT ON properties BEGIN
+        INSERT INTO properties_fts(rowid, name, location, description)
+        VALUES (new.id, new.name, new.location, new.description);
+    END""",
+    """CREATE TRIGGER properties_fts_delete AFTER DELETE ON properties BEGIN
+        INSERT INTO properties_fts(properties_fts, rowid, name, location, description)
+        VALUES ('delete', old.id, old.name, old.location, old.description);
+    END""",
+    """CREATE TRIGGER properties_fts_update AFTER UPDATE OF name, location, description ON properties BEGIN
+        INSERT INTO properties_fts(properties_fts, rowid, name, location, description)
+        VALUES ('delete', old.id, old.name, old.location, old.description);
+        INSERT INTO properties_fts(rowid, name, location, description)
+        VALUES (new.id, new.name, new.location, new.description);
+    END""",
+    # Index the rows that already exist
+    "INSERT INTO properties_fts(properties_fts) VALUES ('rebuild')",
+)
+
+SQLITE_DROP = (
+    "DROP TRIGGER IF EXISTS properties_fts_update",
+    "DROP TRIGGER IF EXISTS properties_fts_delete",
+    "DROP TRIGGER IF EXISTS properties_fts_insert",
+    "DROP TABLE IF EXISTS properties_fts",
+)
+
+
+def install(connection):
+    """Create the search index for ``connection``'s backend if it is missing."""
+    if connection.dialect.name == 'postgresql':
+        statements = PG_DDL
+    elif connection.dialect.name == 'sqlite':
+        if inspect(connection).has_table('properties_fts'):
+            return
+        statements = SQLITE_DDL
+    else:
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def uninstall(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('DROP INDEX IF EXISTS ix_properties_search_vector'))
+        connection.execute(text('ALTER TABLE properties DROP COLUMN IF EXISTS search_vector'))
+    elif connection.dialect.name == 'sqlite':
+        for statement in SQLITE_DROP:
+            connection.execute(text(statement))
+
+
+@event.listens_for(Property.__table__, 'after_create')
+def _install_with_table(target, connection, **kw):
+    install(connection)
+
+
+@event.listens_for(Property.__table__, 'before_drop')
+def _uninstall_with_table(target, connection, **kw):
+    uninstall(connection)
+
+
+def _terms(source):
+    return _TERM.findall((source.get('q') or '').lower())[:MAX_TERMS]
+
+
+def _number(source, name, cast):
+    value = source.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise InvalidSearch(f'{name} must be a number')
+
+
+def _text_match(terms):
+    """(query over (Property, score), score expression) for rows matching every term."""
+    if db.engine.dialect.name == 'postgresql':
+        tsquery = func.to_tsquery(PG_CONFIG, ' & '.join(f'{term}:*' for term in terms))
+        vector = literal_column('properties.search_vector')
+        score = func.ts_rank_cd(vector, tsquery)
+        query = db.session.query(Property, score).filter(vector.op('@@')(tsquery))
+    else:
+        fts = table('properties_fts', column('rowid'))
+        score = -func.bm25(literal_column('properties_fts'), *FTS_WEIGHTS)
+        query = (db.session.query(Property, score)
+                 .join(fts, fts.c.rowid == Property.id)
+                 .filter(text('properties_fts MATCH :match')
+                         .bindparams(match=' '.join(f'"{term}"*' for term in terms))))
+    return query, score
+
+
+def filters(source):
+    """SQL criteria for the price, guest and amenity filters in ``source``."""
+    criteria = []
+    min_price = _number(source, 'min_price', float)
+    max_price = _number(source, 'max_price', float)
+    guests = _number(source, 'guests', int)
+    if min_price is not None:
+        criteria.append(Property.price_per_night >= min_price)
+    if max_price is not None:
+        criteria.append(Property.price_per_night <= max_price)
+    if guests is not None:
+        criteria.append(Property.max_guests >= guests)
+    names = amenity_names(source.get('amenities'))
+    if names:
+        # Properties linked to every requested amenity
+        having_all = (select(PropertyAmenity.property_id)
+                      .join(Amenity, Amenity.id == PropertyAmenity.amenity_id)
+                      .where(Amenity.name.in_(names))
+                      .group_by(PropertyAmenity.property_id)
+                      .having(func.count() == len(names)))
+        criteria.append(Property.id.in_(having_all))
+    return criteria
+
+
+def search_page(source, serialize, prepare=lambda query: query):
+    """
+    One page of results for the request args in ``source`` as
+    ``{"items": [...], "next_cursor": ...}``; each item is ``serialize(property)``
+    plus its ``score`` (None without ``q``). ``prepare`` adds loader options.
+    """
+    terms = _terms(source)
+    criteria = filters(source)
+
+    if not terms:
+        columns = (Property.id,)
+        limit, after = parse_page_args(source, columns)
+        query = prepare(Property.query.filter(*criteria))
+        if after is not None:
+            query = query.filter(Property.id > after[0])
+        rows = [(row, None) for row in query.order_by(Property.id).limit(limit + 1).all()]
+    else:
+        query, score = _text_match(terms)
+        columns = (score.label('score'), Property.id)
+        limit, after = parse_page_args(source, columns)
+        query = prepare(query.filter(*criteria))
+        if after is not None:
+            last_score, last_id = after
+            query = query.filter(or_(score < last_score, and_(score == last_score, Property.id > last_id)))
+        rows = query.order_by(score.desc(), Property.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_score = rows[-1]
+        next_cursor = encode_cursor([last.id] if last_score is None else [last_score, last.id])
+
+    return {
+        "items": [dict(serialize(row), score=None if row_score is None else round(row_score, 4))
+                  for row, row_score in rows],
+        "next_cursor": next_cursor,
+    }
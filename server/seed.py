@@ -3,11 +3,36 @@
 """
 Database seeding script for JamboStays
 Run this to populate your database with sample data
+
+    python seed.py                      # a handful of sample rows
+    python seed.py --users 20000 --properties 100000 --bookings-per-property 10
+
+With any of the size flags the synthetic generator runs instead: it builds
+rows in memory and writes them with bulk Core inserts (COPY on
+PostgreSQL), so a million bookings load in seconds.
 """
 
+import argparse
+import itertools
+import random
+import time
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
-from models import User, Owner, Property, PropertyImage, Booking, Favorite
+from operator import itemgetter
+
+from sqlalchemy import text
+
+from models import (User, Owner, Property, PropertyImage, ImageVariant, ImageBlob, Booking, Favorite,
+                    Amenity, PropertyAmenity, PropertyOccupancy, amenity_names)
 from config import app, db
+from passwords import hasher
+from geo import geocode
+import occupancy
+
+try:
+    from faker import Faker
+except ImportError:  # optional dependency; plain word lists are used instead
+    Faker = None
 
 def seed_database():
     with app.app_context():
@@ -16,9 +41,14 @@ def seed_database():
         try:
             # Clear existing data (optional - remove if you want to keep existing data)
             print("🧹 Clearing existing data...")
+            ImageVariant.query.delete()
+            ImageBlob.query.delete()
             PropertyImage.query.delete()
+            PropertyOccupancy.query.delete()
             Booking.query.delete()
             Favorite.query.delete()
+            PropertyAmenity.query.delete()
+            Amenity.query.delete()
             Property.query.delete()
             Owner.query.delete()
             User.query.delete()
@@ -196,6 +226,7 @@ def seed_database():
                         upload_order=i
                     )
                     db.session.add(property_image)
+                property_obj.refresh_featured_image()
             
             db.session.commit()
             print(f"✅ Created {PropertyImage.query.count()} property images")
@@ -248,6 +279,8 @@ def seed_database():
             for booking_data in bookings:
                 booking = Booking(**booking_data)
                 db.session.add(booking)
+                if booking.booking_status == "confirmed":
+                    occupancy.book(booking)
             
             db.session.commit()
             print(f"✅ Created {Booking.query.count()} bookings")
@@ -290,5 +323,311 @@ def seed_database():
             db.session.rollback()
             raise
 
+# Synthetic data generator
+
+GENERATED_PASSWORD = "password123"
+
+LOCATIONS = [
+    "Nairobi, Kenya", "Mombasa, Kenya", "Diani Beach, Kenya", "Malindi, Kenya", "Lamu, Kenya",
+    "Watamu, Kenya", "Naivasha, Kenya", "Nakuru, Kenya", "Nanyuki, Kenya", "Kisumu, Kenya",
+    "Zanzibar, Tanzania", "Arusha, Tanzania", "Kampala, Uganda", "Kigali, Rwanda",
+    "Cape Town, South Africa", "Malibu, California", "Aspen, Colorado", "Manhattan, New York",
+    "Tulum, Mexico", "Cotswolds, England", "Scottsdale, Arizona",
+]
+DESCRIPTORS = ["Luxury", "Cozy", "Modern", "Rustic", "Oceanview", "Hillside", "Garden",
+               "Historic", "Sunny", "Secluded", "Lakeside", "Safari"]
+KINDS = ["Villa", "Cottage", "Apartment", "Loft", "Cabin", "Bungalow", "Lodge", "Penthouse",
+         "Beach House", "Studio", "Treehouse", "Farmhouse"]
+AMENITIES = ["WiFi", "Kitchen", "Pool", "Air conditioning", "Parking", "Ocean view", "Hot tub",
+             "Fireplace", "Gym access", "Garden", "Beach access", "Workspace", "Washer", "BBQ grill"]
+FIRST_NAMES = ["Amina", "Brian", "Wanjiru", "David", "Emma", "Faith", "George", "Halima", "Ian",
+               "Joy", "Kevin", "Lucy", "Mwangi", "Njeri", "Otieno", "Grace", "Sarah", "Michael"]
+LAST_NAMES = ["Achieng", "Baraka", "Chen", "Kamau", "Johnson", "Kiptoo", "Martinez", "Mutua",
+              "Njoroge", "Odhiambo", "Wafula", "Wilson", "Hassan", "Omondi"]
+IMAGE_URLS = [
+    "https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800&h=600&fit=crop",
+    "https://images.unsplash.com/photo-1582268611958-ebfd161ef9cf?w=800&h=600&fit=crop",
+    "https://images.unsplash.com/photo-1564013799919-ab600027ffc6?w=800&h=600&fit=crop",
+    "https://images.unsplash.com/photo-1600596542815-ffad4c1539a9?w=800&h=600&fit=crop",
+    "https://images.unsplash.com/photo-1600585154340-be6161a56a0c?w=800&h=600&fit=crop",
+]
+# Length-of-stay distribution: mostly short breaks, a tail of longer trips
+NIGHTS = list(range(1, 15))
+NIGHT_WEIGHTS = [10, 22, 20, 14, 10, 7, 6, 3, 2, 2, 1, 1, 1, 1]
+CANCELLATION_RATE = 0.08
+
+
+def _names(rng, seed):
+    if Faker is not None:
+        fake = Faker()
+        fake.seed_instance(seed)
+        while True:
+            yield fake.first_name(), fake.last_name()
+    while True:
+        yield rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _user_rows(count, owners, password_hash, rng, seed, now):
+    names = _names(rng, seed)
+    for user_id in range(1, count + 1):
+        first, last = next(names)
+        yield {
+            "id": user_id,
+            "email": f"{first}.{last}{user_id}@example.com".lower().replace(" ", ""),
+            "password_hash": password_hash,
+            "name": f"{first} {last}",
+            # The first ``owners`` users host the properties
+            "user_type": "owner" if user_id <= owners else "guest",
+            "created_at": now - timedelta(days=rng.randint(0, 1000), seconds=rng.randint(0, 86399)),
+            "profile_version": 1,
+        }
+
+
+def _property_rows(count, owners, images_per_property, rng, now):
+    for property_id in range(1, count + 1):
+        location = rng.choice(LOCATIONS)
+        kind = rng.choice(KINDS)
+        # Scattered a few kilometres around the town centre
+        latitude, longitude = geocode(location)
+        yield {
+            "id": property_id,
+            "name": f"{rng.choice(DESCRIPTORS)} {kind} in {location.split(',')[0]}",
+            "description": f"A {kind.lower()} for up to {rng.randint(2, 12)} guests in {location}.",
+            "location": location,
+            "latitude": round(latitude + rng.gauss(0, 0.05), 6),
+            "longitude": round(longitude + rng.gauss(0, 0.05), 6),
+            # Skewed towards the cheaper end, like real listings
+            "price_per_night": round(min(40 + rng.lognormvariate(4.5, 0.7), 2000), 2),
+            "max_guests": rng.randint(1, 12),
+            "amenities": ", ".join(rng.sample(AMENITIES, rng.randint(3, 8))),
+            "owner_id": rng.randint(1, owners),
+            "created_at": now - timedelta(days=rng.randint(0, 900)),
+            "featured_image_url": IMAGE_URLS[property_id % len(IMAGE_URLS)] if images_per_property else None,
+        }
+
+
+def _amenity_rows(property_rows, amenity_ids):
+    for row in property_rows:
+        for name in amenity_names(row["amenities"]):
+            yield {"property_id": row["id"], "amenity_id": amenity_ids[name]}
+
+
+def _image_rows(properties, images_per_property, now):
+    for property_id in range(1, properties + 1):
+        for n in range(images_per_property):
+            yield {
+                "property_id": property_id,
+                "image_url": IMAGE_URLS[(property_id + n) % len(IMAGE_URLS)],
+                "image_name": f"image_{n + 1}.jpg",
+                "is_featured": n == 0,
+                "upload_order": n,
+                "created_at": now,
+            }
+
+
+def _booking_rows(properties, per_property, guests, prices, rng, now):
+    """Back-to-back stays with random gaps, so no two bookings of a property overlap."""
+    # Dates are handled as ordinals and randomness via random(): randint and
+    # timedelta arithmetic dominate the run at a million rows
+    random_, expovariate, choices = rng.random, rng.expovariate, rng.choices
+    today = now.toordinal()
+    guest_count = len(guests)
+    for property_id in range(1, properties + 1):
+        day = today - 180 - int(random_() * 360)
+        price = prices[property_id - 1]
+        for nights in choices(NIGHTS, NIGHT_WEIGHTS, k=per_property):
+            check_in = day + int(expovariate(0.25))
+            day = check_in + nights
+            guest_name, guest_email = guests[int(random_() * guest_count)]
+            booked_at = datetime.fromordinal(check_in - 1 - int(random_() * 90))
+            yield {
+                "property_id": property_id,
+                "guest_name": guest_name,
+                "guest_email": guest_email,
+                "check_in_date": date.fromordinal(check_in),
+                "check_out_date": date.fromordinal(day),
+                "total_price": round(price * nights, 2),
+                "booking_status": "cancelled" if random_() < CANCELLATION_RATE else "confirmed",
+                "created_at": booked_at if booked_at < now else now,
+            }
+
+
+def _tracked(booking_rows, months):
+    """Pass booking rows through, OR-ing confirmed nights into ``months``."""
+    for row in booking_rows:
+        if row["booking_status"] == "confirmed":
+            for month, mask in occupancy.month_masks(row["check_in_date"], row["check_out_date"]):
+                key = (row["property_id"], month)
+                months[key] = months.get(key, 0) | mask
+        yield row
+
+
+def _clear_tables():
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text(
+            "TRUNCATE image_variants, image_blobs, property_images, property_occupancy, bookings, favorites, property_amenities, amenities, properties, owners, users RESTART IDENTITY CASCADE"
+        ))
+        return
+    for model in (ImageVariant, ImageBlob, PropertyImage, PropertyOccupancy, Booking, Favorite,
+                  PropertyAmenity, Amenity, Property, Owner, User):
+        db.session.execute(model.__table__.delete())
+
+
+def _bulk_insert(table, rows, chunk):
+    """Write an iterable of row dicts to ``table``; returns the number written."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    rows = itertools.chain([first], rows)
+    columns = list(first)
+
+    if db.engine.dialect.name == "postgresql":
+        cursor = db.session.connection().connection.driver_connection.cursor()
+        written = 0
+        with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([row[column] for column in columns])
+                written += 1
+        return written
+
+    if db.engine.dialect.name == "sqlite":
+        # Straight to the driver: Core's per-row bind processing costs more
+        # than the insert itself. Values are stored the way SQLAlchemy does.
+        cursor = db.session.connection().connection.driver_connection.cursor()
+        statement = (f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join('?' * len(columns))})")
+        values = itemgetter(*columns)
+        converters = [(i, _SQLITE_CONVERTERS[type(first[column])]) for i, column in enumerate(columns)
+                      if type(first[column]) in _SQLITE_CONVERTERS]
+        written = 0
+        while True:
+            batch = [values(row) for row in itertools.islice(rows, chunk)]
+            if not batch:
+                return written
+            if converters:
+                batch = [list(row) for row in batch]
+                for row in batch:
+                    for i, convert in converters:
+                        row[i] = convert(row[i])
+            cursor.executemany(statement, batch)
+            written += len(batch)
+
+    written = 0
+    while True:
+        batch = list(itertools.islice(rows, chunk))
+        if not batch:
+            return written
+        db.session.execute(table.insert(), batch)
+        written += len(batch)
+
+
+# SQLAlchemy's SQLite storage formats, so generated rows compare correctly
+# against values the app writes
+_SQLITE_CONVERTERS = {
+    datetime: lambda value: value.isoformat(" ", "microseconds"),
+    date: date.isoformat,
+}
+
+
+@contextmanager
+def _indexes_dropped(*tables):
+    """Build secondary indexes once after loading rather than row by row."""
+    connection = db.session.connection()
+    indexes = [index for table in tables for index in table.indexes]
+    for index in indexes:
+        index.drop(connection, checkfirst=True)
+    yield
+    for index in indexes:
+        index.create(connection)
+
+
+def _reset_sequences(tables):
+    # Rows were written with explicit ids; move PostgreSQL sequences past them
+    if db.engine.dialect.name != "postgresql":
+        return
+    for table in tables:
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+        ))
+
+
+def generate_dataset(users=1000, properties=1000, bookings_per_property=10, seed=42,
+                     images_per_property=3, owner_ratio=0.1, chunk=50000):
+    """Replace the database contents with a reproducible synthetic dataset."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    owners = max(1, int(users * owner_ratio))
+    if users <= owners:
+        raise ValueError("need more users than owners so there are guests to book")
+
+    with app.app_context():
+        started = time.perf_counter()
+        print(f"🌱 Generating {users} users, {properties} properties, "
+              f"{properties * bookings_per_property} bookings (seed {seed})...")
+        try:
+            _clear_tables()
+            # Every generated user shares one hash; hashing each would dominate the run
+            password_hash = hasher.hash(GENERATED_PASSWORD)
+
+            user_rows = list(_user_rows(users, owners, password_hash, rng, seed, now))
+            _bulk_insert(User.__table__, user_rows, chunk)
+            # Properties reference the legacy owners table; mirror the owner users into it
+            _bulk_insert(Owner.__table__, ({"id": row["id"], "name": row["name"], "email": row["email"],
+                                            "created_at": row["created_at"]}
+                                           for row in user_rows[:owners]), chunk)
+            guests = [(row["name"], row["email"]) for row in user_rows[owners:]]
+            del user_rows
+            print(f"👤 {users} users ({owners} owners)")
+
+            amenity_ids = Amenity.ids(db.session, amenity_names(", ".join(AMENITIES)))
+            with _indexes_dropped(Property.__table__, PropertyAmenity.__table__,
+                                  PropertyImage.__table__, Booking.__table__):
+                property_rows = list(_property_rows(properties, owners, images_per_property, rng, now))
+                _bulk_insert(Property.__table__, property_rows, chunk)
+                # Core inserts skip the ORM hook that indexes amenities
+                _bulk_insert(PropertyAmenity.__table__, _amenity_rows(property_rows, amenity_ids), chunk)
+                prices = [row["price_per_night"] for row in property_rows]
+                del property_rows
+                images = _bulk_insert(PropertyImage.__table__,
+                                      _image_rows(properties, images_per_property, now), chunk)
+                print(f"🏨 {properties} properties, {images} images")
+
+                months = {}
+                bookings = _bulk_insert(Booking.__table__, _tracked(_booking_rows(
+                    properties, bookings_per_property, guests, prices, rng, now), months), chunk)
+                _bulk_insert(PropertyOccupancy.__table__,
+                             ({"property_id": property_id, "month": month, "nights": nights}
+                              for (property_id, month), nights in months.items()), chunk)
+                print(f"📅 {bookings} bookings")
+
+            _reset_sequences(("users", "owners", "properties"))
+            db.session.commit()
+        except Exception as e:
+            print(f"❌ Error during generation: {str(e)}")
+            db.session.rollback()
+            raise
+
+        print(f"🎉 Done in {time.perf_counter() - started:.1f}s. "
+              f"Every user's password is {GENERATED_PASSWORD}")
+
+
 if __name__ == "__main__":
-    seed_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the JamboStays database")
+    parser.add_argument("--users", type=int, help="generate this many users (10%% owners)")
+    parser.add_argument("--properties", type=int, help="generate this many properties")
+    parser.add_argument("--bookings-per-property", type=int, help="non-overlapping stays per property")
+    parser.add_argument("--images-per-property", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42, help="random seed, for reproducible data")
+    args = parser.parse_args()
+
+    if args.users is None and args.properties is None and args.bookings_per_property is None:
+        seed_database()
+    else:
+        generate_dataset(
+            users=args.users or 1000,
+            properties=args.properties or 1000,
+            bookings_per_property=10 if args.bookings_per_property is None else args.bookings_per_property,
+            seed=args.seed,
+            images_per_property=args.images_per_property,
+        )
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Hand-written serializers for the hot read endpoints.
+
+``SerializerMixin.to_dict`` reflects over every column and relationship on
+each call and walks the whole object graph (property -> images -> property
+-> bookings ...). The serializers here are plain tuples of
+``(name, getter)`` pairs built once at import time, and each endpoint emits
+an explicit field set. Clients may narrow it further with a sparse fieldset,
+e.g. ``GET /api/properties?fields=id,name,price_per_night``.
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+
+from models import Owner, Property, Booking, PropertyImage
+
+# Same formats SerializerMixin uses, so payloads stay byte-compatible
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _column_getter(name):
+    def get(obj):
+        value = getattr(obj, name)
+        if isinstance(value, datetime):
+            return value.strftime(DATETIME_FORMAT)
+        if isinstance(value, date):
+            return value.strftime(DATE_FORMAT)
+        return value
+    return get
+
+
+def _columns(model):
+    return {column.key: _column_getter(column.key) for column in model.__table__.columns}
+
+
+class Serializer:
+    def __init__(self, fields, profiles):
+        self.fields = fields
+        self.profiles = {name: self._compile(names) for name, names in profiles.items()}
+
+    def _compile(self, names):
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+        return tuple((name, self.fields[name]) for name in names)
+
+    @lru_cache(maxsize=256)
+    def sparse(self, names):
+        return self._compile(names)
+
+    def plan(self, profile, fields=None):
+        """Field plan for a named profile, or for an explicit ``?fields=`` list."""
+        if fields:
+            return self.sparse(fields)
+        return self.profiles[profile]
+
+    @staticmethod
+    def dump(obj, plan):
+        return {name: get(obj) for name, get in plan}
+
+    def serializer(self, profile, fields=None):
+        plan = self.plan(profile, fields)
+        return lambda obj: self.dump(obj, plan)
+
+
+def requested_fields(source):
+    """Parse a ``fields=a,b,c`` parameter into a hashable tuple, or None."""
+    raw = source.get('fields') if source is not None else None
+    if not raw:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    return names or None
+
+
+owner_serializer = Serializer(
+    fields=_columns(Owner),
+    profiles={
+        'default': ('id', 'name', 'email', 'phone', 'created_at'),
+    },
+)
+
+image_serializer = Serializer(
+    fields=_columns(PropertyImage),
+    profiles={
+        'card': ('id', 'image_url', 'is_featured', 'upload_order'),
+        'default': ('id', 'property_id', 'image_url', 'image_name', 'is_featured',
+                    'upload_order', 'created_at'),
+    },
+)
+
+booking_serializer = Serializer(
+    fields=_columns(Booking),
+    profiles={
+        'default': ('id', 'property_id', 'guest_name', 'guest_email', 'check_in_date',
+                    'check_out_date', 'total_price', 'booking_status', 'created_at'),
+    },
+)
+
+_IMAGE_CARD = image_serializer.profiles['card']
+_BOOKING_DEFAULT = booking_serializer.profiles['default']
+_OWNER_DEFAULT = owner_serializer.profiles['default']
+
+property_serializer = Serializer(
+    fields={
+        **_columns(Property),
+        'images': lambda p: [Serializer.dump(i, _IMAGE_CARD) for i in p.images],
+        'owner': lambda p: Serializer.dump(p.owner, _OWNER_DEFAULT) if p.owner else None,
+        'bookings': lambda p: [Serializer.dump(b, _BOOKING_DEFAULT) for b in p.bookings],
+    },
+    profiles={
+        # Everything the listing and dashboard cards render
+        'card': ('id', 'name', 'description', 'location', 'latitude', 'longitude',
+                 'price_per_night', 'max_guests', 'amenities', 'owner_id', 'created_at',
+                 'featured_image_url', 'images'),
+        'detail': ('id', 'name', 'description', 'location', 'latitude', 'longitude',
+                   'price_per_night', 'max_guests', 'amenities', 'owner_id', 'created_at',
+                   'featured_image_url', 'images', 'owner'),
+        # An owner's own listings, with the reservations made against them
+        'owner_dashboard': ('id', 'name', 'description', 'location', 'price_per_night',
+                            'max_guests', 'amenities', 'owner_id', 'created_at',
+                            'featured_image_url', 'images', 'bookings'),
+    },
+)
+
+_PROPERTY_CARD = property_serializer.profiles['card']
+
+# Bookings can opt back into their property with ?fields=...,property
+booking_serializer.fields['property'] = lambda b: Serializer.dump(b.property, _PROPERTY_CARD)
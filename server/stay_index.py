@@ -0,0 +1,116 @@
+"""
+In-process interval index of confirmed stays, used for booking conflict checks.
+
+Each property gets a list of its confirmed stays sorted by check-in date,
+loaded lazily from the bookings table the first time the property is
+checked and then updated as bookings are created or cancelled. An overlap
+check is a binary search plus a scan over the few stays that start within
+one "longest stay" of the requested check-in, so it never needs a table scan.
+
+Entries expire after ``STAY_INDEX_TTL`` seconds so a worker picks up bookings
+written by other processes.
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+
+from config import app
+from models import Booking
+
+
+class _PropertyStays:
+    __slots__ = ('starts', 'stays', 'max_nights', 'loaded_at')
+
+    def __init__(self, rows, loaded_at):
+        self.stays = sorted(rows)  # (check_in, check_out, booking_id)
+        self.starts = [stay[0] for stay in self.stays]
+        self.max_nights = max(((out - inn).days for inn, out, _ in self.stays), default=0)
+        self.loaded_at = loaded_at
+
+    def conflict(self, check_in, check_out):
+        # Only stays starting before check_out can overlap, and none of them
+        # can start earlier than check_in minus the longest stay on record.
+        hi = bisect_left(self.starts, check_out)
+        lo = bisect_right(self.starts, check_in - timedelta(days=self.max_nights))
+        for start, end, booking_id in self.stays[lo:hi]:
+            if end > check_in:
+                return booking_id
+        return None
+
+    def add(self, check_in, check_out, booking_id):
+        stay = (check_in, check_out, booking_id)
+        insort(self.stays, stay)
+        self.starts.insert(bisect_left(self.stays, stay), check_in)
+        self.max_nights = max(self.max_nights, (check_out - check_in).days)
+
+    def remove(self, check_in, booking_id):
+        i = bisect_left(self.starts, check_in)
+        while i < len(self.starts) and self.starts[i] == check_in:
+            if self.stays[i][2] == booking_id:
+                del self.stays[i]
+                del self.starts[i]
+                return
+            i += 1
+
+
+class StayIndex:
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self._properties = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return app.config['STAY_INDEX_TTL']
+
+    def _load(self, property_id):
+        rows = (
+            Booking.query
+            .with_entities(Booking.check_in_date, Booking.check_out_date, Booking.id)
+            .filter(Booking.property_id == property_id, Booking.booking_status == 'confirmed')
+            .all()
+        )
+        return _PropertyStays([tuple(row) for row in rows], time.monotonic())
+
+    def _get(self, property_id):
+        with self._lock:
+            stays = self._properties.get(property_id)
+        if stays is not None and time.monotonic() - stays.loaded_at < self.ttl:
+            return stays
+
+        stays = self._load(property_id)
+        with self._lock:
+            self._properties[property_id] = stays
+        return stays
+
+    def conflict(self, property_id, check_in, check_out):
+        """Id of a confirmed booking overlapping [check_in, check_out), or None."""
+        stays = self._get(property_id)
+        with self._lock:
+            return stays.conflict(check_in, check_out)
+
+    def add(self, booking):
+        with self._lock:
+            stays = self._properties.get(booking.property_id)
+            if stays is not None:
+                stays.add(booking.check_in_date, booking.check_out_date, booking.id)
+
+    def remove(self, booking):
+        with self._lock:
+            stays = self._properties.get(booking.property_id)
+            if stays is not None:
+                stays.remove(booking.check_in_date, booking.id)
+
+    def invalidate(self, property_id=None):
+        with self._lock:
+            if property_id is None:
+                self._properties.clear()
+            else:
+                self._properties.pop(property_id, None)
+
+
+stay_index = StayIndex()
@@ -0,0 +1,164 @@
+"""
+Structured, non-blocking logging for the API.
+
+Application loggers live under ``jambostays`` (``jambostays.auth``,
+``jambostays.api``, ...). Records are handed to a ``QueueHandler`` on the
+request thread and written to stderr by a ``QueueListener`` thread, so a
+log call never waits on the stream. Each record carries the id of the
+request that produced it, taken from an incoming ``X-Request-ID`` header or
+generated, and echoed back on the response.
+
+Configuration (environment):
+
+    LOG_LEVEL       level for the jambostays loggers (default INFO)
+    LOG_LEVELS      per-logger overrides, e.g.
+                    jambostays.auth=DEBUG,sqlalchemy.engine=INFO
+    LOG_SAMPLING    keep only a fraction of a logger's DEBUG/INFO records,
+                    e.g. jambostays.auth=0.05; warnings and errors are
+                    never sampled
+    LOG_FORMAT      json (default) or text
+
+Disabled levels cost one ``isEnabledFor`` check; guard anything expensive
+to build (header dumps and the like) with it.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import has_request_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_ENVIRON_KEY = 'jambostays.request_id'
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+
+def _parse_mapping(value):
+    """``a=1,b=2`` -> {'a': '1', 'b': '2'}"""
+    pairs = (item.split('=', 1) for item in (value or '').split(',') if '=' in item)
+    return {name.strip(): setting.strip() for name, setting in pairs}
+
+
+def request_id():
+    if not has_request_context():
+        return '-'
+    return request.environ.get(_ENVIRON_KEY, '-')
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name):
+        # The most specific configured logger wins: jambostays.auth.login
+        # falls back to jambostays.auth, then jambostays
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    Queues records with the message merged but the traceback kept apart in
+    ``exc_text``, so JsonFormatter can put it under ``exc``; the stock
+    ``prepare`` folds it into ``msg`` and clears ``exc_text``.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # Tracebacks hold frames alive; the text is all the listener needs
+        record.exc_info = None
+        return record
+
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+
+_listener = None
+
+
+def configure_logging(app):
+    """Install the queue handler and per-request ids. Safe to call once per process."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if os.environ.get('LOG_FORMAT', 'json').lower() == 'text':
+        stream.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+    handler = StructuredQueueHandler(records)
+    # Filters run on the calling thread, where the request is still bound
+    handler.addFilter(RequestIdFilter())
+    sampling = {name: float(rate) for name, rate in _parse_mapping(os.environ.get('LOG_SAMPLING')).items()}
+    if sampling:
+        handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger('jambostays')
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    root.addHandler(handler)
+    root.propagate = False
+    for name, level in _parse_mapping(os.environ.get('LOG_LEVELS')).items():
+        logger = logging.getLogger(name)
+        logger.setLevel(level.upper())
+        if not name.startswith('jambostays'):
+            logger.addHandler(handler)
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        request.environ[_ENVIRON_KEY] = incoming[:64] if incoming else uuid.uuid4().hex
+
+    @app.after_request
+    def echo_request_id(response):
+        response.headers.setdefault(REQUEST_ID_HEADER, request_id())
+        return response
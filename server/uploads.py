@@ -0,0 +1,190 @@
+"""
+Streaming multipart uploads for property images.
+
+werkzeug normally parses a multipart body into memory, or into an anonymous
+temporary file, and the view then copies it again with ``file.save()``.
+``UploadRequest`` instead hands each file part to a ``StreamedUpload``
+created directly in the folder the view chooses (the image store's). As the parser produces
+chunks they are hashed (sha256) on the request thread and queued for
+writing; the writes themselves run on a shared thread pool, so the disk
+work for one photo overlaps with parsing the next and a large batch is
+written concurrently rather than one ``save()`` after another. Storing a
+file is then a rename.
+
+Configuration (environment):
+
+    UPLOAD_WRITE_WORKERS    threads writing upload chunks (default 4)
+    UPLOAD_BUFFER_BYTES     bytes a single upload may have queued for
+                            writing before the parser waits (default 1MB)
+    UPLOAD_FSYNC            fsync each file before it is stored (default false)
+"""
+
+import atexit
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Request
+
+WRITE_WORKERS = int(os.environ.get('UPLOAD_WRITE_WORKERS') or 4)
+BUFFER_BYTES = int(os.environ.get('UPLOAD_BUFFER_BYTES') or 1024 * 1024)
+FSYNC = os.environ.get('UPLOAD_FSYNC', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Chunk size when an upload arrives as an ordinary (already parsed) stream
+COPY_CHUNK = 64 * 1024
+
+_writers = ThreadPoolExecutor(WRITE_WORKERS, thread_name_prefix='upload-writer')
+atexit.register(_writers.shutdown, wait=False)
+
+
+class StreamedUpload:
+    """Write target for one uploaded file: hashes on write, flushes on the pool.
+
+    Writes for a single file are applied in order by at most one pool task at
+    a time; the task only runs while chunks are pending, so files never hold
+    a pool thread while waiting for the parser.
+    """
+
+    def __init__(self, directory):
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._scheduled = False
+        self._error = None
+        self._drained = threading.Condition()
+        self.stored = False
+
+    # File-like interface used by the multipart parser
+    def write(self, data):
+        data = bytes(data)
+        self._hash.update(data)
+        self.size += len(data)
+        with self._drained:
+            if self._error is not None:
+                raise self._error
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            if not self._scheduled:
+                self._scheduled = True
+                _writers.submit(self._flush)
+            # Back-pressure: a slow disk must not turn into unbounded memory
+            while self._pending_bytes > BUFFER_BYTES and self._error is None:
+                self._drained.wait()
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        # The parser rewinds a finished part; nothing is read back from it
+        return 0
+
+    def close(self):
+        # Called by werkzeug when the request ends: drop anything not stored
+        if not self.stored:
+            self.discard()
+
+    def _flush(self):
+        while True:
+            with self._drained:
+                chunks, self._pending = self._pending, []
+                self._pending_bytes = 0
+                self._drained.notify_all()
+                if not chunks:
+                    self._scheduled = False
+                    return
+            try:
+                self._file.writelines(chunks)
+            except OSError as e:
+                with self._drained:
+                    self._error = e
+                    self._pending = []
+                    self._scheduled = False
+                    self._drained.notify_all()
+                return
+
+    def _wait(self):
+        with self._drained:
+            while self._scheduled:
+                self._drained.wait()
+            if self._error is not None:
+                raise self._error
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def finish(self):
+        """Wait for pending writes and close the temporary file."""
+        self._wait()
+        if not self._file.closed:
+            self._file.flush()
+            if FSYNC:
+                os.fsync(self._file.fileno())
+            self._file.close()
+
+    def store(self, path):
+        """Move the finished upload to ``path``."""
+        self.finish()
+        os.replace(self.temp_path, path)
+        self.stored = True
+        return path
+
+    def discard(self):
+        # Chunks not yet written are dropped rather than written and deleted
+        with self._drained:
+            self._pending = []
+            self._pending_bytes = 0
+            self._drained.notify_all()
+        try:
+            self._wait()
+        except OSError:
+            pass
+        if not self._file.closed:
+            self._file.close()
+        if not self.stored and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    @classmethod
+    def copy_from(cls, stream, directory):
+        """Stream an already-parsed file (e.g. spooled by werkzeug) in chunks."""
+        upload = cls(directory)
+        try:
+            for chunk in iter(lambda: stream.read(COPY_CHUNK), b''):
+                upload.write(chunk)
+        except BaseException:
+            upload.discard()
+            raise
+        return upload
+
+
+class UploadRequest(Request):
+    """Streams file parts into ``upload_directory`` when a view sets it.
+
+    The view must set the attribute before first touching ``request.files``
+    or ``request.form``; other requests parse exactly as before.
+    """
+
+    upload_directory = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_directory is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        upload = StreamedUpload(self.upload_directory)
+        self.__dict__.setdefault('_streamed_uploads', []).append(upload)
+        return upload
+
+    def close(self):
+        super().close()
+        # Also covers parts of a body that failed to parse (e.g. 413)
+        for upload in self.__dict__.get('_streamed_uploads', ()):
+            upload.close()
+
+
+def streamed(file, directory):
+    """The ``StreamedUpload`` holding a ``FileStorage``'s content."""
+    if isinstance(file.stream, StreamedUpload):
+        return file.stream
+    return StreamedUpload.copy_from(file.stream, directory)